@@ -0,0 +1,43 @@
+import os
+import random
+import time
+
+# Os módulos de utils leem LISTA_REQUISICOES do ambiente ao serem importados
+os.environ.setdefault("LISTA_REQUISICOES", "[]")
+
+DIA_MS = 24 * 60 * 60 * 1000
+
+
+def cronometrar(funcao, repeticoes=3):
+    """Menor tempo (s) entre ``repeticoes`` execuções da função."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def imprimirTabela(cabecalho, linhas):
+    """Imprime os resultados alinhados em colunas."""
+    linhas = [[str(valor) for valor in linha] for linha in linhas]
+    larguras = [max(len(str(titulo)), *(len(linha[i]) for linha in linhas)) for i, titulo in enumerate(cabecalho)]
+
+    print("  ".join(str(titulo).rjust(largura) for titulo, largura in zip(cabecalho, larguras)))
+    for linha in linhas:
+        print("  ".join(valor.rjust(largura) for valor, largura in zip(linha, larguras)))
+
+
+def gerarItens(quantidade, agora_ms, semente=0):
+    """Itens sintéticos já normalizados (como saem de normalizarItem), de até 30 dias atrás."""
+    aleatorio = random.Random(semente)
+    return [
+        {
+            "user": {"name": f"Cliente {i % 500}", "email": f"cliente{i % 500}@exemplo.com"},
+            "sensor": {"description": f"Sensor {i}", "maintenance": aleatorio.choice([True, False])},
+            "lastMeasurementTimestamp": agora_ms - aleatorio.randrange(30 * DIA_MS),
+            "TipoMedidor": aleatorio.choice(["ENERGIA", "ÁGUA"]),
+            "fonte": aleatorio.choice(["LiteMe", "Lyum"])
+        }
+        for i in range(quantidade)
+    ]
@@ -0,0 +1,78 @@
+"""Busca das fontes em série x em paralelo, contra um servidor HTTP local com latência simulada.
+
+Execução, a partir da pasta src: python -m benchmarks.fontes_paralelas [--latencia 0.2]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.comum import cronometrar, gerarItens, imprimirTabela
+
+from utils import requisicoes
+
+SENSORES_POR_FONTE = 2000
+
+
+def criarServidor(latencia):
+    """Servidor local que responde ao login e à lista de sensores de cada fonte após ``latencia`` segundos."""
+    corpo_sensores = json.dumps({"data": gerarItens(SENSORES_POR_FONTE, int(time.time() * 1000))}).encode()
+
+    class Stub(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def responder(self, corpo):
+            time.sleep(latencia)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_POST(self):
+            self.responder(json.dumps({"token": "token-de-teste"}).encode())
+
+        def do_GET(self):
+            self.responder(corpo_sensores)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latência (s) de cada resposta do servidor")
+    parser.add_argument("--fontes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    servidor = criarServidor(args.latencia)
+    base = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    linhas = []
+    for quantidade in args.fontes:
+        fontes = [
+            {"url": f"{base}/sensores/{i}", "fonte": "LiteMe", "login": f"{base}/login/{i}"}
+            for i in range(quantidade)
+        ]
+
+        def buscar(paralelo):
+            # Cada execução refaz os logins, como numa atualização nova
+            requisicoes._tokens.clear()
+            registros = requisicoes.buscarTodosAtrasados(fontes, paralelo=paralelo, montar=requisicoes.extrairCampos)
+            assert len(registros) == quantidade * SENSORES_POR_FONTE
+
+        serie = cronometrar(lambda: buscar(False), repeticoes=2)
+        paralelo = cronometrar(lambda: buscar(True), repeticoes=2)
+        linhas.append([quantidade, f"{serie:.2f}", f"{paralelo:.2f}", f"{serie / paralelo:.1f}x"])
+
+    servidor.shutdown()
+    imprimirTabela(["fontes", "série (s)", "paralelo (s)", "ganho"], linhas)
+
+
+if __name__ == "__main__":
+    main()
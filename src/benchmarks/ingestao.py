@@ -0,0 +1,118 @@
+"""Gravação no histórico: upsert linha a linha (antigo salvarTabela) x COPY + upsert único (atual).
+
+Grava dias sintéticos de 1999 no PostgreSQL configurado em DB_* e apaga tudo no fim;
+use apenas um banco de teste.
+
+Execução, a partir da pasta src: python -m benchmarks.ingestao --banco-de-teste [--linhas 20000]
+"""
+import argparse
+import os
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+from benchmarks.comum import gerarItens, imprimirTabela
+
+from utils.conexao import obterConexao
+from utils.controlar_banco_de_dados import RELATORIOS_DIR, salvarTabela
+from utils.migracoes import aplicarMigracoes
+from utils.requisicoes import extrairCampos, montarTabela
+from utils.snapshot import hashConteudo
+
+DIA_ANTES = date(1999, 1, 10)
+DIA_DEPOIS = date(1999, 1, 11)
+
+
+def tabelaDoDia(itens, dia):
+    df = montarTabela([campos for campos in map(extrairCampos, itens) if campos is not None])
+    df["DataAtual"] = dia.strftime("%d/%m/%Y")
+    return df
+
+
+def gravarLinhaALinha(df):
+    """Reproduz o salvarTabela original: um INSERT ... ON CONFLICT por linha."""
+    df = df.copy()
+    df["DataAtual"] = pd.to_datetime(df["DataAtual"], dayfirst=True).dt.strftime("%Y-%m-%d")
+    df["DataÚltimaLeitura"] = pd.to_datetime(df["DataÚltimaLeitura"], dayfirst=True).dt.strftime("%Y-%m-%d")
+    df["status"] = df["Dias off."].gt(0).map({True: "OFF", False: "ON"})
+
+    with obterConexao() as conn, conn.cursor() as cursor:
+        for _, row in df.iterrows():
+            cursor.execute("""
+                INSERT INTO historico_sensores (
+                    data_registro, nome, descricao_sensor, email, ultima_leitura, plataforma, tipo_medidor, status, manutencao
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (data_registro, nome, descricao_sensor) DO UPDATE
+                SET
+                ultima_leitura = EXCLUDED.ultima_leitura,
+                status = EXCLUDED.status,
+                manutencao = EXCLUDED.manutencao
+            """, (
+                row["DataAtual"], row["Nome"], row["DescriçãoSensor"], row["Email"], row["DataÚltimaLeitura"],
+                row["Plataforma"], row["TipoMedidor"], row["status"], row["Manutencao"]
+            ))
+
+
+def limpar(hashes):
+    """Remove as linhas, partição, resumo, controle de ingestão e relatório gerados pelo benchmark."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM historico_sensores WHERE data_registro = ANY(%s)", ([DIA_ANTES, DIA_DEPOIS],))
+        cursor.execute("DELETE FROM resumo_diario_status WHERE data_registro = ANY(%s)", ([DIA_ANTES, DIA_DEPOIS],))
+        cursor.execute("DELETE FROM ingestoes WHERE hash_conteudo = ANY(%s)", (hashes,))
+
+        cursor.execute("SELECT to_regclass('historico_sensores_1999_01')")
+        if cursor.fetchone()[0] is not None:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM historico_sensores_1999_01)")
+            if not cursor.fetchone()[0]:
+                cursor.execute("DROP TABLE historico_sensores_1999_01")
+
+    relatorio = os.path.join(RELATORIOS_DIR, "historico_1999_01.parquet")
+    if os.path.exists(relatorio):
+        os.remove(relatorio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=20_000)
+    parser.add_argument("--banco-de-teste", action="store_true",
+                        help="Confirma que DB_* aponta para um banco de teste")
+    args = parser.parse_args()
+
+    if not args.banco_de_teste:
+        parser.error("grava no banco configurado em DB_*; confirme com --banco-de-teste")
+
+    aplicarMigracoes()
+
+    itens = gerarItens(args.linhas, int(datetime.now().timestamp() * 1000))
+    df_antes = tabelaDoDia(itens, DIA_ANTES)
+    df_depois = tabelaDoDia(itens, DIA_DEPOIS)
+    df_particao = df_antes.head(1)
+    hashes = [hashConteudo(df_depois), hashConteudo(df_particao)]
+
+    limpar(hashes)
+    try:
+        # A partição do mês é criada antes, para medir só a gravação
+        salvarTabela(df_particao)
+
+        inicio = time.perf_counter()
+        gravarLinhaALinha(df_antes)
+        antes = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        salvarTabela(df_depois)
+        depois = time.perf_counter() - inicio
+    finally:
+        limpar(hashes)
+
+    imprimirTabela(
+        ["caminho", "linhas", "tempo (s)", "linhas/s"],
+        [
+            ["linha a linha", len(df_antes), f"{antes:.2f}", f"{len(df_antes) / antes:,.0f}"],
+            ["COPY + upsert", len(df_depois), f"{depois:.2f}", f"{len(df_depois) / depois:,.0f}"],
+        ]
+    )
+
+
+if __name__ == "__main__":
+    main()
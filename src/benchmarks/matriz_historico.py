@@ -0,0 +1,140 @@
+"""Matriz do Histórico de Tags: laço por sensor/dia x pivot x códigos int8 e filtros por status.
+
+Execução, a partir da pasta src: python -m benchmarks.matriz_historico [--sensores 5000] [--dias 90]
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmarks.comum import cronometrar, imprimirTabela
+
+from utils.historico import (
+    COLUNAS_SENSOR, FILTROS_STATUS, SEM_REGISTRO, datasComRegistro, filtrarPorStatus, montarMatrizStatus,
+    rotularStatus
+)
+
+
+def gerarDados(sensores, dias, semente=0):
+    """Registros sintéticos do histórico: um por sensor e dia, com ~5% dos dias sem registro."""
+    aleatorio = random.Random(semente)
+    inicio = date(2024, 1, 1)
+    datas = [(inicio + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(dias)]
+
+    registros = []
+    for i in range(sensores):
+        # Um terço dos sensores fica sempre ON, um décimo sempre OFF e o resto varia
+        perfil = i % 30
+        for data in datas:
+            if aleatorio.random() < 0.05:
+                continue
+            if perfil < 10:
+                status = "ON"
+            elif perfil < 13:
+                status = "OFF"
+            else:
+                status = aleatorio.choice(["ON", "OFF"])
+            registros.append((f"Sensor {i}", f"Cliente {i % 500}", "LiteMe", "ENERGIA", data, status, "False"))
+
+    df_dados = pd.DataFrame(registros, columns=["descricao_sensor", "nome", "plataforma", "tipo_medidor",
+                                                "data_registro", "status", "manutencao"])
+    df_dados["data_registro"] = pd.to_datetime(df_dados["data_registro"])
+    return df_dados.sort_values(["descricao_sensor", "data_registro"]), datas
+
+
+def montarComLaco(df_dados, datas):
+    """Reproduz a montagem original da página: um filtro por sensor e outro por dia."""
+    tabela = []
+    sensores_unicos = df_dados[list(COLUNAS_SENSOR)].drop_duplicates()
+    for _, sensor in sensores_unicos.iterrows():
+        linha = {titulo: sensor[coluna] for coluna, titulo in COLUNAS_SENSOR.items()}
+        df_sensor = df_dados[df_dados["descricao_sensor"] == sensor["descricao_sensor"]]
+        for data in datas:
+            status_dia = df_sensor.loc[df_sensor["data_registro"] == data, "status"]
+            linha[data] = status_dia.iloc[0] if not status_dia.empty else SEM_REGISTRO
+        tabela.append(linha)
+    return pd.DataFrame(tabela)
+
+
+def montarComPivot(df_dados, datas):
+    """Versão com um único pivot e a matriz em texto."""
+    sensores = df_dados[list(COLUNAS_SENSOR)].drop_duplicates()
+    status = (
+        df_dados.drop_duplicates(["descricao_sensor", "data_registro"])
+        .pivot(index="descricao_sensor", columns="data_registro", values="status")
+    )
+    status.columns = pd.to_datetime(status.columns).strftime("%Y-%m-%d")
+    status = status.reindex(columns=list(datas)).fillna(SEM_REGISTRO)
+    tabela = sensores.merge(status, left_on="descricao_sensor", right_index=True, how="left")
+    return tabela.rename(columns=COLUNAS_SENSOR).reset_index(drop=True)
+
+
+def filtrarComConjuntos(tabela, datas, modo):
+    """Filtros originais: um set por linha via apply."""
+    colunas = list(datas)
+    if modo == "Todos com Variações":
+        return tabela[tabela[colunas].apply(lambda linha: len(set(linha)) > 1, axis=1)]
+    esperado = {"Todos ON": "ON", "Todos OFF": "OFF", "Todos —": SEM_REGISTRO}[modo]
+    return tabela[tabela[colunas].apply(lambda linha: set(linha) == {esperado}, axis=1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sensores", type=int, default=5000)
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--amostra-laco", type=int, default=200,
+                        help="Sensores usados no laço original (o tempo é extrapolado para o total)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    df_dados, datas = gerarDados(args.sensores, args.dias)
+    amostra = df_dados[df_dados["descricao_sensor"].isin([f"Sensor {i}" for i in range(args.amostra_laco)])]
+
+    # --- Montagem da matriz ---
+    laco = cronometrar(lambda: montarComLaco(amostra, datas), 1) * args.sensores / args.amostra_laco
+    pivot = cronometrar(lambda: montarComPivot(df_dados, datas), args.repeticoes)
+    int8 = cronometrar(lambda: montarMatrizStatus(df_dados, datas), args.repeticoes)
+
+    print(f"Montagem da matriz ({args.sensores} sensores x {args.dias} dias, {len(df_dados)} registros)")
+    imprimirTabela(
+        ["versão", "tempo (s)", "x laço"],
+        [
+            [f"laço (extrapolado de {args.amostra_laco})", f"{laco:.2f}", "1.0"],
+            ["pivot (texto)", f"{pivot:.3f}", f"{laco / pivot:.0f}"],
+            ["montarMatrizStatus (int8)", f"{int8:.3f}", f"{laco / int8:.0f}"],
+        ]
+    )
+
+    # --- Filtros por status e memória ---
+    tabela_texto = montarComPivot(df_dados, datas)
+    tabela_codigos = montarMatrizStatus(df_dados, datas)
+    datas_validas = datasComRegistro(tabela_codigos, datas)
+
+    linhas = []
+    for modo in FILTROS_STATUS:
+        conjuntos = cronometrar(lambda: filtrarComConjuntos(tabela_texto, datas_validas, modo), args.repeticoes)
+        vetorizado = cronometrar(lambda: filtrarPorStatus(tabela_codigos, datas_validas, modo), args.repeticoes)
+        linhas.append([modo, f"{conjuntos:.3f}", f"{vetorizado:.4f}", f"{conjuntos / vetorizado:.0f}"])
+
+    print()
+    print("Filtros por status")
+    imprimirTabela(["modo", "set por linha (s)", "int8 (s)", "x"], linhas)
+
+    memoria_texto = tabela_texto[datas].memory_usage(deep=True).sum()
+    memoria_codigos = tabela_codigos[datas].memory_usage(deep=True).sum()
+    rotulada = cronometrar(lambda: rotularStatus(tabela_codigos, datas_validas), args.repeticoes)
+
+    print()
+    imprimirTabela(
+        ["matriz", "memória (MB)"],
+        [
+            ["texto (object)", f"{memoria_texto / 2 ** 20:.1f}"],
+            ["códigos int8", f"{memoria_codigos / 2 ** 20:.1f}"],
+        ]
+    )
+    print(f"rotularStatus (apenas para exibição): {rotulada:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
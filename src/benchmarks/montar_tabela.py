@@ -0,0 +1,42 @@
+"""Montagem da tabela de sensores: linha a linha (montarLinha) x vetorizada (montarTabela).
+
+Execução, a partir da pasta src: python -m benchmarks.montar_tabela [--tamanhos 10000 100000 1000000]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.comum import cronometrar, gerarItens, imprimirTabela
+
+from utils.requisicoes import COLUNAS_TABELA, extrairCampos, montarLinha, montarTabela
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    linhas = []
+    for tamanho in args.tamanhos:
+        itens = gerarItens(tamanho, int(time.time() * 1000))
+
+        def porLinha():
+            return pd.DataFrame([linha for linha in map(montarLinha, itens) if linha is not None])
+
+        def vetorizada():
+            return montarTabela([campos for campos in map(extrairCampos, itens) if campos is not None])
+
+        # Os dois caminhos precisam gerar a mesma tabela antes de comparar os tempos
+        pd.testing.assert_frame_equal(porLinha()[COLUNAS_TABELA], vetorizada(), check_dtype=False)
+
+        por_linha = cronometrar(porLinha, args.repeticoes)
+        vetorizado = cronometrar(vetorizada, args.repeticoes)
+        linhas.append([f"{tamanho:,}", f"{por_linha:.3f}", f"{vetorizado:.3f}", f"{por_linha / vetorizado:.1f}x"])
+
+    imprimirTabela(["sensores", "por linha (s)", "vetorizado (s)", "ganho"], linhas)
+
+
+if __name__ == "__main__":
+    main()
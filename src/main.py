@@ -4,12 +4,16 @@ import pandas as pd
 import streamlit as st
 
 from utils.controlar_banco_de_dados import salvarTabela
-from utils.enviar_emails import send_email
+from utils.caixa_saida import enfileirarEmails, hashSensores, resumoCaixaSaida
 from utils.mensagens import gerarMensagem, gerarMensagemHTML_bonito
-from utils.requisicoes import gerarTabelas
+from utils.agendador import acompanharAgendador, situacaoTarefa, solicitarExecucao
+from utils.snapshot import CAMINHO_SNAPSHOT, exportarExcel, hashConteudo, lerSnapshot
+from utils.migracoes import aplicarMigracoes
 from utils.ui import aplicar_estilo_sidebar
 
 aplicar_estilo_sidebar()
+aplicarMigracoes()
+acompanharAgendador()
 
 # Caminho absoluto até a raiz do projeto
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__)))
@@ -30,32 +34,54 @@ st.title("Relatório de Medidores offline")
 # Definir campo para fazer upload de arquivo
 uploaded_file = st.file_uploader("Selecione o arquivo Excel (.xlsx)", type=["xlsx"])
 
-# Usa arquivo da sessão, se já existir
+# Usa arquivo da sessão, se já existir; senão, o último snapshot gerado pelo agendador
 if uploaded_file is not None:
     st.session_state["uploaded_file"] = uploaded_file
 elif "uploaded_file" in st.session_state:
     uploaded_file = st.session_state["uploaded_file"]
+elif os.path.exists(CAMINHO_SNAPSHOT):
+    uploaded_file = CAMINHO_SNAPSHOT
 
-# --- Botão para gerar tabelas ---
-if st.button("🔄 Gerar Tabelas de Requisições"):
-    with st.spinner("Gerando tabelas e atualizando dados..."):
-        try:
-            if gerarTabelas():
-                st.success("Tabelas geradas e salvas com sucesso!")
-                uploaded_file = os.path.join(TABELAS_DIR, 'sensores_atrasados.xlsx')
-                st.session_state["uploaded_file"] = uploaded_file
-        except Exception as e:
-            st.error(f"Erro ao gerar tabelas: {e}")
+# --- Atualização das tabelas (executada pelo agendador: python -m utils.agendador) ---
+situacao = situacaoTarefa("sensores")
+
+if situacao["atualizado_em"]:
+    st.caption(f"Dados de sensores atualizados em {situacao['atualizado_em']:%d/%m/%Y %H:%M}")
+if situacao["status"] == "erro":
+    st.warning(f"A última atualização falhou: {situacao['mensagem']}")
+
+if situacao["em_andamento"]:
+    st.info("⏳ Atualização das tabelas em andamento no agendador.")
+elif st.button("🔄 Gerar Tabelas de Requisições"):
+    solicitarExecucao("sensores")
+    st.session_state.pop("uploaded_file", None)
+    st.success("Atualização solicitada! As tabelas serão geradas pelo agendador em instantes.")
 
 # Verifica se o arquivo foi enviado
 if uploaded_file is not None:
-    # Salva o arquivo enviado na sessão
-    if "df" not in st.session_state:
-        st.session_state["df"] = pd.read_excel(uploaded_file, sheet_name="Sheet1")
+    # Salva o arquivo enviado na sessão (relido apenas quando o conteúdo muda)
+    hash_arquivo = hashConteudo(uploaded_file)
+    if st.session_state.get("hash_df") != hash_arquivo:
+        st.session_state["df"] = lerSnapshot(uploaded_file)
+        st.session_state["hash_df"] = hash_arquivo
+        st.session_state.pop("excel", None)
 
     df = st.session_state["df"]
 
-    salvarTabela(uploaded_file)
+    # Conteúdo já gravado não gera nenhuma escrita no banco
+    salvarTabela(df, hash_conteudo=hash_arquivo)
+
+    # Exportação em Excel apenas sob demanda
+    if st.button("📄 Exportar planilha Excel"):
+        st.session_state["excel"] = exportarExcel(df)
+
+    if "excel" in st.session_state:
+        st.download_button(
+            "⬇️ Baixar sensores_atrasados.xlsx",
+            st.session_state["excel"],
+            "sensores_atrasados.xlsx",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
 
     try:
         # Remove a coluna OBS, se existir
@@ -114,6 +140,43 @@ if uploaded_file is not None:
         grupos = dados_filtrados.groupby('Nome')
 
         st.subheader("Detalhes por Usuário")
+
+        # --- Envio em lote: um e-mail por cliente e plataforma, gravado na caixa de saída ---
+        # O envio é feito pelo agendador; e-mails já notificados recentemente são ignorados
+        if st.button(f"📨 Notificar todos ({dados_filtrados.groupby(['Nome', 'Plataforma']).ngroups} e-mails)"):
+            mensagens = [
+                {
+                    "Nome": nome,
+                    "Plataforma": plataforma,
+                    "to_address": subgrupo['Email'].iloc[0],
+                    "subject": "Atualização de Medidores Offline",
+                    "content": gerarMensagemHTML_bonito(subgrupo),
+                    "hash_sensores": hashSensores(subgrupo)
+                }
+                for (nome, plataforma), subgrupo in dados_filtrados.groupby(['Nome', 'Plataforma'])
+            ]
+
+            enfileirados = enfileirarEmails(mensagens)
+            if enfileirados:
+                solicitarExecucao("emails")
+
+            resultados = pd.DataFrame(mensagens)[["Nome", "Plataforma", "to_address"]]
+            resultados["Situação"] = [
+                "Na fila" if (m["to_address"], m["hash_sensores"]) in enfileirados else "Ignorado (já na fila ou notificado recentemente)"
+                for m in mensagens
+            ]
+            st.session_state["resultado_envio"] = resultados.rename(columns={"to_address": "Email"})
+
+        if "resultado_envio" in st.session_state:
+            resultados = st.session_state["resultado_envio"]
+            na_fila = int((resultados["Situação"] == "Na fila").sum())
+            st.success(f"{na_fila} de {len(resultados)} e-mail(s) colocados na fila de envio.")
+            st.dataframe(resultados, width='stretch', hide_index=True)
+
+        resumo_fila = resumoCaixaSaida()
+        if resumo_fila:
+            st.caption("Caixa de saída: " + ", ".join(f"{status}: {qtd}" for status, qtd in sorted(resumo_fila.items())))
+
         for nome, grupo_cliente in grupos:
             with st.expander(f"{nome}  -  {len(grupo_cliente)} registro(s)"):
 
@@ -130,16 +193,20 @@ if uploaded_file is not None:
                     # Botão para enviar e-mail
                     email_destinatario = subgrupo['Email'].iloc[0]  # pega o email do cliente
                     if st.button(f"✉️ Enviar e-mail para {nome} ({email_destinatario})"):
-                        with st.spinner(f"Enviando e-mail para {email_destinatario}..."):
-                            try:
-                                resultado = send_email(
-                                    to_address=email_destinatario,
-                                    subject="Atualização de Medidores Offline",
-                                    content=gerarMensagemHTML_bonito(subgrupo)
-                                )
-                                st.success(f"E-mail enviado com sucesso para {email_destinatario}!")
-                            except Exception as e:
-                                st.error(f"Erro ao enviar e-mail: {e}")
+                        try:
+                            enfileirados = enfileirarEmails([{
+                                "to_address": email_destinatario,
+                                "subject": "Atualização de Medidores Offline",
+                                "content": gerarMensagemHTML_bonito(subgrupo),
+                                "hash_sensores": hashSensores(subgrupo)
+                            }])
+                            if enfileirados:
+                                solicitarExecucao("emails")
+                                st.success(f"E-mail para {email_destinatario} colocado na fila de envio!")
+                            else:
+                                st.info(f"{email_destinatario} já foi notificado sobre estes sensores recentemente.")
+                        except Exception as e:
+                            st.error(f"Erro ao enfileirar e-mail: {e}")
 
     except Exception as e:
         st.error(f"Erro ao processar planilha: {e}")
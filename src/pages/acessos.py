@@ -1,43 +1,25 @@
 import calendar
-from datetime import datetime
+from datetime import date, datetime
 
 import pandas as pd
 import streamlit as st
 
 from utils.controlar_banco_de_dados import (
-    salvarUsuarios,
-    salvarMetricas,
     buscarMetricasPorMes,
     buscarMetricasComUsuarios,
     alternarStatusUsuario
 )
-from utils.requisicoes import buscarUsuarios, buscarMetricas
+from utils.agendador import acompanharAgendador, situacaoTarefa, solicitarExecucao
+from utils.migracoes import aplicarMigracoes
 from utils.ui import aplicar_estilo_sidebar
 
 
-# =========================
-# ESTADO DA APLICAÇÃO
-# =========================
-if "status_atualizacao" not in st.session_state:
-    st.session_state.status_atualizacao = None
-
-
-# =========================
-# FUNÇÕES
-# =========================
-def atualizar_metricas(ts_inicio_ms, ts_fim_ms):
-    usuarios = buscarUsuarios()
-    salvarUsuarios(usuarios)
-    salvarMetricas(
-        buscarMetricas(usuarios, ts_inicio_ms, ts_fim_ms)
-    )
-    st.session_state.status_atualizacao = "sucesso"
-
-
 # =========================
 # CONFIGURAÇÃO DA PÁGINA
 # =========================
 aplicar_estilo_sidebar()
+aplicarMigracoes()
+acompanharAgendador()
 
 st.set_page_config(
     page_title="Acessos dos clientes",
@@ -65,25 +47,27 @@ with col2:
         value=hoje
     )
 
-dt_inicio = datetime.combine(data_inicio, datetime.min.time())
 dt_fim = datetime.combine(data_fim, datetime.min.time())
 
-ts_inicio_ms = int(dt_inicio.timestamp() * 1000)
 ts_fim_ms = int(dt_fim.timestamp() * 1000)
 
 
 # =========================
 # BOTÃO ATUALIZAR MÉTRICAS
 # =========================
-if st.sidebar.button("🔄 Atualizar métricas"):
-    st.session_state.status_atualizacao = "processando"
+# A sincronização roda no agendador (python -m utils.agendador); a página só faz o pedido
+situacao = situacaoTarefa("acessos")
 
-if st.session_state.status_atualizacao == "processando":
-    with st.spinner("🔄 Atualizando métricas..."):
-        atualizar_metricas(ts_inicio_ms, ts_fim_ms)
+if situacao["atualizado_em"]:
+    st.sidebar.caption(f"Métricas atualizadas em {situacao['atualizado_em']:%d/%m/%Y %H:%M}")
+if situacao["status"] == "erro":
+    st.sidebar.warning(f"A última atualização falhou: {situacao['mensagem']}")
 
-if st.session_state.status_atualizacao == "sucesso":
-    st.sidebar.success("✅ Métricas atualizadas com sucesso!")
+if situacao["em_andamento"]:
+    st.sidebar.info("⏳ Atualização de métricas em andamento no agendador.")
+elif st.sidebar.button("🔄 Atualizar métricas"):
+    solicitarExecucao("acessos", inicio=data_inicio.isoformat(), fim=data_fim.isoformat())
+    st.sidebar.success("✅ Atualização solicitada! As métricas serão sincronizadas em instantes.")
 
 
 # =========================
@@ -137,19 +121,15 @@ with col2Fim:
 # =========================
 metricas_mes_atual = buscarMetricasPorMes(ts_fim_ms)
 
-if not metricas_mes_atual:
-    usuarios = buscarUsuarios()
-    salvarUsuarios(usuarios)
-    salvarMetricas(
-        buscarMetricas(usuarios, ts_inicio_ms, ts_fim_ms)
-    )
+if not metricas_mes_atual and not situacao["em_andamento"]:
+    st.info("Ainda não há métricas deste mês; elas serão carregadas na próxima execução do agendador.")
 
 
 # =========================
 # BUSCA DE DADOS
 # =========================
-mes_ano_inicio = f"{mesIni:02d}/{anoIni}"
-mes_ano_fim = f"{mesFim:02d}/{anoFim}"
+mes_ano_inicio = date(anoIni, mesIni, 1)
+mes_ano_fim = date(anoFim, mesFim, 1)
 
 dados = buscarMetricasComUsuarios(
     mes_ano_inicio,
@@ -168,7 +148,7 @@ df = pd.DataFrame(
     ]
 )
 
-df["mes_dt"] = pd.to_datetime(df["mes"], format="%m/%Y")
+df["mes_dt"] = pd.to_datetime(df["mes"])
 
 
 # =========================
@@ -1,10 +1,19 @@
 import os
-import pandas as pd
 import streamlit as st
-from sqlalchemy import create_engine
+from utils.agendador import acompanharAgendador
+from utils.consultas_sensores import (
+    TAMANHO_PAGINA,
+    buscarPaginaSensores,
+    dividirExportacao,
+    exportarCsvSensores,
+    montarFiltrosSensores
+)
+from utils.migracoes import aplicarMigracoes
 from utils.ui import aplicar_estilo_sidebar
 
 aplicar_estilo_sidebar()
+aplicarMigracoes()
+acompanharAgendador()
 
 # Caminhos
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -16,15 +25,6 @@ os.makedirs(DATABASE_DIR, exist_ok=True)
 os.makedirs(TABELAS_DIR, exist_ok=True)
 os.makedirs(RELATORIOS_DIR, exist_ok=True)
 
-# Banco de dados
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-
-engine = create_engine(f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-
 # Página
 st.set_page_config(page_title="Consultas de Sensores", layout="wide")
 st.title("Consultas de Sensores Atrasados")
@@ -38,39 +38,70 @@ nome = st.sidebar.text_input("Nome do cliente:")
 email = st.sidebar.text_input("Email:")
 plataforma = st.sidebar.text_input("Plataforma:")
 
-# Query base
-query = "SELECT * FROM historico_sensores WHERE 1=1"
-params = {}
+if mes and not (mes.isdigit() and 1 <= int(mes) <= 12):
+    st.sidebar.error("Informe o mês como um número de 1 a 12.")
+    st.stop()
 
 # Filtros dinâmicos
-if ano:
-    query += " AND EXTRACT(YEAR FROM data_registro) = %(ano)s"
-    params["ano"] = int(ano)
-if mes:
-    query += " AND EXTRACT(MONTH FROM data_registro) = %(mes)s"
-    params["mes"] = int(mes)
-if data_registro:
-    query += " AND DATE(data_registro) = %(data_registro)s"
-    params["data_registro"] = data_registro
-if nome:
-    query += " AND nome ILIKE %(nome)s"
-    params["nome"] = f"%{nome}%"
-if email:
-    query += " AND email ILIKE %(email)s"
-    params["email"] = f"%{email}%"
-if plataforma:
-    query += " AND plataforma ILIKE %(plataforma)s"
-    params["plataforma"] = f"%{plataforma}%"
-
-# ✅ O segredo: use %(nome)s e params = dict, não lista
-df = pd.read_sql_query(query, engine, params=params)
+where, params = montarFiltrosSensores(ano, mes, data_registro, nome, email, plataforma)
+
+
+def descartarCsv():
+    st.session_state.pop("consultas_csv_partes", None)
+    st.session_state.pop("consultas_csv", None)
+
+
+# Volta para a primeira página quando os filtros mudam
+assinatura_filtros = (where, tuple(sorted(params.items())))
+if st.session_state.get("consultas_filtros") != assinatura_filtros:
+    st.session_state["consultas_filtros"] = assinatura_filtros
+    st.session_state["consultas_paginas"] = [None]
+    descartarCsv()
+
+# Chave (data_registro, id) a partir da qual cada página visitada começa
+paginas = st.session_state["consultas_paginas"]
+
+# Busca um registro a mais para saber se existe próxima página
+df = buscarPaginaSensores(where, params, paginas[-1], limite=TAMANHO_PAGINA + 1)
+tem_proxima = len(df) > TAMANHO_PAGINA
+df = df.iloc[:TAMANHO_PAGINA]
 
 # Exibir resultados
 if not df.empty:
-    st.success(f"{len(df)} registros encontrados")
+    st.success(f"Página {len(paginas)}: {len(df)} registros")
     st.dataframe(df, width='stretch')
-
-    csv_data = df.to_csv(index=False).encode("utf-8")
-    st.download_button("⬇️ Baixar como CSV", csv_data, "consultas_sensores.csv", "text/csv")
 else:
     st.warning("Nenhum registro encontrado com esses filtros.")
+
+col_anterior, col_proxima = st.columns(2)
+if col_anterior.button("⬅️ Página anterior", disabled=len(paginas) == 1):
+    paginas.pop()
+    st.rerun()
+if col_proxima.button("Próxima página ➡️", disabled=not tem_proxima):
+    ultimo = df.iloc[-1]
+    paginas.append((ultimo["data_registro"], int(ultimo["id"])))
+    st.rerun()
+
+# Exportação completa em CSV, gerada sob demanda e dividida em partes de tamanho limitado;
+# só a parte escolhida fica em memória
+if not df.empty:
+    if st.button("📄 Gerar CSV com todos os registros"):
+        descartarCsv()
+        st.session_state["consultas_csv_partes"] = dividirExportacao(where, params)
+
+    partes = st.session_state.get("consultas_csv_partes")
+    if partes:
+        indice = 0
+        if len(partes) > 1:
+            indice = st.selectbox(
+                f"Parte do CSV ({len(partes)} arquivos)", range(len(partes)),
+                format_func=lambda i: f"Parte {i + 1}"
+            )
+
+        csv = st.session_state.get("consultas_csv")
+        if csv is None or csv[0] != indice:
+            csv = (indice, exportarCsvSensores(where, params, partes[indice]))
+            st.session_state["consultas_csv"] = csv
+
+        nome_arquivo = "consultas_sensores.csv" if len(partes) == 1 else f"consultas_sensores_parte_{indice + 1}.csv"
+        st.download_button("⬇️ Baixar como CSV", csv[1], nome_arquivo, "text/csv")
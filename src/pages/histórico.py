@@ -1,28 +1,34 @@
+import math
 import os
 from datetime import datetime, timedelta
 
 import altair as alt
 import pandas as pd
 import streamlit as st
-from sqlalchemy import create_engine
 
+from utils.agendador import acompanharAgendador
+from utils.cache import lerSql
+from utils.historico import (
+    FILTROS_STATUS,
+    ROTULOS_STATUS_EMOJI,
+    TAMANHO_PAGINA_HISTORICO,
+    datasComRegistro,
+    filtrarPorStatus,
+    montarMatrizStatus,
+    rotularStatus
+)
+from utils.migracoes import aplicarMigracoes
 from utils.ui import aplicar_estilo_sidebar
 
 aplicar_estilo_sidebar()
+aplicarMigracoes()
+acompanharAgendador()
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATABASE_DIR = os.path.join(BASE_DIR, "database")
 TABELAS_DIR = os.path.join(DATABASE_DIR, "tabelas")
 RELATORIOS_DIR = os.path.join(BASE_DIR, "relatorios")
 
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-
-engine = create_engine(f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-
 st.set_page_config(page_title="Histórico de Medidores", layout="wide")
 
 # --- Sidebar: seleção de período ---
@@ -50,8 +56,6 @@ delta = (data_fim - data_inicio).days + 1
 datas = [(data_inicio + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(delta)]
 
 # --- Montar tabela ---
-tabela = []
-
 # Buscar todos os registros dentro do intervalo selecionado
 query_dados = """
     SELECT descricao_sensor, nome, plataforma, tipo_medidor, data_registro, status, manutencao
@@ -59,40 +63,18 @@ query_dados = """
     WHERE data_registro BETWEEN %(inicio)s AND %(fim)s
 """
 
+# Contagens ON/OFF por dia, lidas do resumo mantido a cada ingestão
 query_dados_grafico = """
-        SELECT 
-        COALESCE(medidores_ON.data_registro, medidores_OFF.data_registro) AS data_registro,
-        COALESCE(medidores_OFF.quantidade, 0) AS off,
-        COALESCE(medidores_ON.quantidade, 0) AS on
-    FROM (
-        SELECT data_registro, COUNT(1) AS quantidade
-        FROM historico_sensores
-        WHERE data_registro BETWEEN %(inicio)s AND %(fim)s
-          AND LOWER(manutencao) != LOWER('false')
-          AND (data_registro - ultima_leitura) > 1
-          AND LOWER(tipo_medidor) = LOWER('ENERGIA')
-          AND LOWER(plataforma) != LOWER('LiteMe - UFCG')
-        GROUP BY data_registro
-    ) medidores_OFF
-    FULL JOIN (
-        SELECT data_registro, COUNT(1) AS quantidade
-        FROM historico_sensores
-        WHERE data_registro BETWEEN %(inicio)s AND %(fim)s
-          AND (
-                (LOWER(manutencao) = LOWER('false') 
-                 AND LOWER(tipo_medidor) = LOWER('ENERGIA')
-                 AND LOWER(plataforma) != LOWER('LiteMe - UFCG'))
-    
-                OR
-    
-                (LOWER(manutencao) != LOWER('false')
-                 AND LOWER(tipo_medidor) = LOWER('ENERGIA')
-                 AND LOWER(plataforma) != LOWER('LiteMe - UFCG')
-                 AND (data_registro - ultima_leitura) < 2)
-              )
-        GROUP BY data_registro
-    ) medidores_ON
-    ON medidores_ON.data_registro = medidores_OFF.data_registro
+    SELECT
+        data_registro,
+        SUM(off_count) AS off,
+        SUM(on_count) AS on
+    FROM resumo_diario_status
+    WHERE data_registro BETWEEN %(inicio)s AND %(fim)s
+      AND LOWER(tipo_medidor) = LOWER('ENERGIA')
+      AND LOWER(plataforma) != LOWER('LiteMe - UFCG')
+    GROUP BY data_registro
+    HAVING SUM(off_count) + SUM(on_count) > 0
     ORDER BY data_registro;
 """
 
@@ -101,8 +83,8 @@ parametros_periodo = {
     "fim": data_fim.strftime("%Y-%m-%d")
 }
 
-df_dados = pd.read_sql_query(query_dados, engine, params=parametros_periodo)
-df_dados_grafico = pd.read_sql_query(query_dados_grafico, engine, params=parametros_periodo)
+df_dados = lerSql(query_dados, parametros_periodo)
+df_dados_grafico = lerSql(query_dados_grafico, parametros_periodo)
 
 
 # --- Normalizar a coluna data_registro (corrigir timestamps em ms) ---
@@ -123,33 +105,8 @@ df_dados_grafico['data_registro'] = df_dados_grafico['data_registro'].dt.strftim
 df_dados['data_registro'] = pd.to_datetime(df_dados['data_registro'])
 df_dados = df_dados.sort_values(['descricao_sensor', 'data_registro'])
 
-# Obter listas de sensores únicos
-sensores_unicos = df_dados[['descricao_sensor', 'nome', 'plataforma', 'tipo_medidor', 'manutencao']].drop_duplicates()
-
-# Montar cada linha
-for _, sensor in sensores_unicos.iterrows():
-    tag = sensor['descricao_sensor']
-    nome = sensor['nome']
-    plataforma = sensor['plataforma']
-    tipo = sensor['tipo_medidor']
-    manutencao = sensor['manutencao']
-
-    linha = {
-        "Tag": tag,
-        "Nome": nome,
-        "Plataforma": plataforma,
-        "Tipo medidor": tipo,
-        "Manutenção": manutencao
-    }
-
-    # Filtrar dados desse sensor
-    df_sensor = df_dados[df_dados['descricao_sensor'] == tag]
-
-    for data in datas:
-        status_dia = df_sensor.loc[df_sensor['data_registro'] == data, 'status']
-        linha[data] = status_dia.iloc[0] if not status_dia.empty else "—"
-
-    tabela.append(linha)
+# Monta a matriz sensor × dia (status em int8) de uma vez
+df_tabela = montarMatrizStatus(df_dados, datas)
 
 
 def colorir_celulas(valor):
@@ -160,11 +117,8 @@ def colorir_celulas(valor):
     return "text-align: center; vertical-align: middle;"
 
 
-# Criar DataFrame final
-df_tabela = pd.DataFrame(tabela)
-
 # Remover as colunas de datas em que todos os sensores estão com "—"
-datas_validas = [data for data in datas if not (df_tabela[data] == "—").all()]
+datas_validas = datasComRegistro(df_tabela, datas)
 df_tabela = df_tabela[["Tag", "Nome", "Plataforma", "Tipo medidor", "Manutenção"] + datas_validas]
 
 # Atualizar a lista de datas para o gráfico
@@ -201,28 +155,35 @@ aplicar_filtro_variacao = st.sidebar.checkbox("Ativar filtro por status")
 if aplicar_filtro_variacao:
     opcao_status_todos = st.sidebar.selectbox(
         "Mostrar sensores que estão:",
-        ["Todos com Variações", "Todos ON", "Todos OFF", "Todos —"]
+        FILTROS_STATUS
     )
 
-    colunas_datas = [col for col in df_tabela.columns if col in datas]
-
-    if opcao_status_todos == "Todos com Variações":
-        mascara_variacao = df_tabela[colunas_datas].apply(lambda linha: len(set(linha)) > 1, axis=1)
-        df_tabela = df_tabela[mascara_variacao]
-    elif opcao_status_todos == "Todos ON":
-        df_tabela = df_tabela[df_tabela[colunas_datas].apply(lambda l: set(l) == {"ON"}, axis=1)]
-    elif opcao_status_todos == "Todos OFF":
-        df_tabela = df_tabela[df_tabela[colunas_datas].apply(lambda l: set(l) == {"OFF"}, axis=1)]
-    elif opcao_status_todos == "Todos —":
-        df_tabela = df_tabela[df_tabela[colunas_datas].apply(lambda l: set(l) == {"—"}, axis=1)]
+    df_tabela = filtrarPorStatus(df_tabela, colunas_datas, opcao_status_todos)
 
 st.title("📊 Histórico de Tags")
-df_styled = df_tabela.style.map(colorir_celulas, subset=datas)
 
 aba1, aba2 = st.tabs(["📋 Tabela", "📈 Gráfico"])
 
 with aba1:
-    st.dataframe(df_styled, width='stretch', hide_index=True)
+    # Só a página visível é rotulada e enviada ao navegador
+    total_paginas = max(1, math.ceil(len(df_tabela) / TAMANHO_PAGINA_HISTORICO))
+
+    col_pagina, col_cores = st.columns([1, 3])
+    pagina = col_pagina.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+    colorir = col_cores.toggle("Colorir células (mais lento)")
+
+    inicio_pagina = (pagina - 1) * TAMANHO_PAGINA_HISTORICO
+    df_pagina = df_tabela.iloc[inicio_pagina:inicio_pagina + TAMANHO_PAGINA_HISTORICO]
+
+    st.caption(f"Página {pagina} de {total_paginas} - {len(df_tabela)} sensores")
+
+    if colorir:
+        df_exibicao = rotularStatus(df_pagina, datas).style.map(colorir_celulas, subset=datas)
+    else:
+        df_exibicao = rotularStatus(df_pagina, datas, ROTULOS_STATUS_EMOJI)
+
+    config.update({data: st.column_config.TextColumn(data, width="small") for data in datas})
+    st.dataframe(df_exibicao, width='stretch', hide_index=True, column_config=config)
 
 with aba2:
     df_counts = pd.DataFrame({
@@ -0,0 +1,251 @@
+import argparse
+import os
+import threading
+import time
+import traceback
+from datetime import date
+
+from psycopg2.extras import Json
+
+from utils.cache import invalidarCache
+from utils.caixa_saida import caixaSaidaTemPendentes, processarCaixaSaida
+from utils.conexao import obterConexao
+from utils.controlar_banco_de_dados import salvarTabela
+from utils.requisicoes import gerarTabelas
+from utils.sincronizar_acessos import sincronizarMetricas
+from utils.snapshot import CAMINHO_SNAPSHOT
+
+# Intervalo (s) entre execuções automáticas de cada tarefa e pausa do laço principal
+AGENDADOR_INTERVALO_SENSORES = int(os.getenv("AGENDADOR_INTERVALO_SENSORES", "3600"))
+AGENDADOR_INTERVALO_ACESSOS = int(os.getenv("AGENDADOR_INTERVALO_ACESSOS", "21600"))
+AGENDADOR_INTERVALO_EMAILS = int(os.getenv("AGENDADOR_INTERVALO_EMAILS", "300"))
+AGENDADOR_PAUSA = int(os.getenv("AGENDADOR_PAUSA", "30"))
+
+# Execuções presas em "executando" por mais que isso (s) são consideradas abandonadas
+AGENDADOR_LIMITE_EXECUCAO = int(os.getenv("AGENDADOR_LIMITE_EXECUCAO", "3600"))
+
+
+def atualizarSensores():
+    """Gera o snapshot dos sensores atrasados e o grava no histórico."""
+    gerarTabelas()
+    salvarTabela(CAMINHO_SNAPSHOT)
+
+
+def atualizarAcessos(inicio=None, fim=None):
+    """Sincroniza os acessos; ``inicio``/``fim`` chegam como datas ISO quando pedidos pela página."""
+    return sincronizarMetricas(
+        inicio=date.fromisoformat(inicio) if inicio else None,
+        fim=date.fromisoformat(fim) if fim else None
+    )
+
+
+# Tarefa: (função, intervalo, verificação de que há trabalho ou None para rodar sempre)
+TAREFAS = {
+    "sensores": (atualizarSensores, AGENDADOR_INTERVALO_SENSORES, None),
+    "acessos": (atualizarAcessos, AGENDADOR_INTERVALO_ACESSOS, None),
+    "emails": (processarCaixaSaida, AGENDADOR_INTERVALO_EMAILS, caixaSaidaTemPendentes),
+}
+
+# Tarefas que alteram os dados lidos pelas páginas
+TAREFAS_DADOS = ["sensores", "acessos"]
+
+
+# --- Consultas usadas pelas páginas ---
+
+def solicitarExecucao(tarefa, **parametros):
+    """Pede ao agendador que execute a tarefa no próximo ciclo (ignorado se já houver pedido em aberto).
+
+    Os parâmetros são repassados à função da tarefa e precisam ser serializáveis em JSON.
+    """
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO execucoes_agendador (tarefa, parametros)
+            SELECT %(tarefa)s, %(parametros)s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM execucoes_agendador
+                WHERE tarefa = %(tarefa)s AND status IN ('pendente', 'executando')
+            )
+        """, {"tarefa": tarefa, "parametros": Json(parametros)})
+
+
+def situacaoTarefa(tarefa):
+    """Horário da última atualização bem-sucedida, resultado da última execução e se há outra em aberto."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT MAX(finalizado_em) FILTER (WHERE status = 'sucesso'),
+                   BOOL_OR(status IN ('pendente', 'executando'))
+            FROM execucoes_agendador
+            WHERE tarefa = %s
+        """, (tarefa,))
+        atualizado_em, em_andamento = cursor.fetchone()
+
+        cursor.execute("""
+            SELECT status, mensagem
+            FROM execucoes_agendador
+            WHERE tarefa = %s AND status IN ('sucesso', 'erro')
+            ORDER BY id DESC
+            LIMIT 1
+        """, (tarefa,))
+        status, mensagem = cursor.fetchone() or (None, None)
+
+    return {
+        "atualizado_em": atualizado_em,
+        "em_andamento": bool(em_andamento),
+        "status": status,
+        "mensagem": mensagem
+    }
+
+
+_ultima_execucao_vista = None
+_lock = threading.Lock()
+
+
+def acompanharAgendador():
+    """Descarta o cache de consultas deste processo quando o agendador conclui uma nova atualização de dados."""
+    global _ultima_execucao_vista
+
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT MAX(id) FROM execucoes_agendador
+            WHERE status = 'sucesso' AND tarefa = ANY(%s)
+        """, (TAREFAS_DADOS,))
+        ultima = cursor.fetchone()[0]
+
+    with _lock:
+        if ultima != _ultima_execucao_vista:
+            _ultima_execucao_vista = ultima
+            invalidarCache()
+
+
+# --- Worker ---
+
+def _reservarExecucao(tarefa, intervalo):
+    """Marca como "executando" o pedido pendente da tarefa ou, vencido o intervalo, cria um novo.
+
+    Retorna (id, parâmetros) da execução ou None quando não há nada a fazer.
+    """
+    with obterConexao() as conn, conn.cursor() as cursor:
+        # Libera execuções de um worker que caiu no meio do caminho
+        cursor.execute("""
+            UPDATE execucoes_agendador
+            SET status = 'erro', finalizado_em = NOW(), mensagem = 'Execução abandonada'
+            WHERE tarefa = %s AND status = 'executando'
+              AND iniciado_em < NOW() - make_interval(secs => %s)
+        """, (tarefa, AGENDADOR_LIMITE_EXECUCAO))
+
+        cursor.execute("""
+            UPDATE execucoes_agendador
+            SET status = 'executando', iniciado_em = NOW()
+            WHERE id = (
+                SELECT id FROM execucoes_agendador
+                WHERE tarefa = %s AND status = 'pendente'
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, parametros
+        """, (tarefa,))
+        linha = cursor.fetchone()
+        if linha:
+            return linha
+
+        cursor.execute("""
+            INSERT INTO execucoes_agendador (tarefa, status, iniciado_em)
+            SELECT %(tarefa)s, 'executando', NOW()
+            WHERE NOT EXISTS (
+                SELECT 1 FROM execucoes_agendador
+                WHERE tarefa = %(tarefa)s
+                  AND (status = 'executando'
+                       OR iniciado_em > NOW() - make_interval(secs => %(intervalo)s))
+            )
+            RETURNING id, parametros
+        """, {"tarefa": tarefa, "intervalo": intervalo})
+        return cursor.fetchone()
+
+
+def _finalizarExecucao(id_execucao, status, mensagem=None):
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            UPDATE execucoes_agendador
+            SET status = %s, finalizado_em = NOW(), mensagem = %s
+            WHERE id = %s
+        """, (status, mensagem, id_execucao))
+
+
+def _concluirPedidosSemTrabalho(tarefa):
+    # Pedidos feitos pelas páginas são encerrados, para não ficarem pendentes indefinidamente
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            UPDATE execucoes_agendador
+            SET status = 'sucesso', iniciado_em = NOW(), finalizado_em = NOW(),
+                mensagem = 'Nada a processar no momento'
+            WHERE tarefa = %s AND status = 'pendente'
+        """, (tarefa,))
+
+
+def executarTarefa(tarefa, forcar=False):
+    """Executa a tarefa se houver pedido pendente, se o intervalo venceu ou se ``forcar``.
+
+    Tarefas com verificação de trabalho não rodam quando não há nada a fazer; pedidos
+    pendentes delas são concluídos com "Nada a processar no momento". Retorna True
+    quando a tarefa rodou com sucesso.
+    """
+    funcao, intervalo, tem_trabalho = TAREFAS[tarefa]
+
+    if tem_trabalho is not None and not tem_trabalho():
+        _concluirPedidosSemTrabalho(tarefa)
+        return False
+
+    execucao = _reservarExecucao(tarefa, 0 if forcar else intervalo)
+    if execucao is None:
+        return False
+
+    id_execucao, parametros = execucao
+
+    print(f"Executando tarefa {tarefa} (execução {id_execucao})")
+    inicio = time.perf_counter()
+
+    try:
+        resultado = funcao(**parametros)
+    except Exception as e:
+        traceback.print_exc()
+        _finalizarExecucao(id_execucao, "erro", str(e))
+        return False
+
+    duracao = time.perf_counter() - inicio
+    mensagem = f"Concluída em {duracao:.1f}s"
+    if isinstance(resultado, int) and not isinstance(resultado, bool):
+        mensagem += f" ({resultado} registros)"
+
+    _finalizarExecucao(id_execucao, "sucesso", mensagem)
+    print(f"Tarefa {tarefa}: {mensagem}")
+    return True
+
+
+def rodarAgendador(tarefas=None, uma_vez=False):
+    """Laço do worker: verifica as tarefas a cada AGENDADOR_PAUSA segundos."""
+    tarefas = tarefas or list(TAREFAS)
+
+    while True:
+        for tarefa in tarefas:
+            executarTarefa(tarefa, forcar=uma_vez)
+
+        if uma_vez:
+            return
+
+        time.sleep(AGENDADOR_PAUSA)
+
+
+# Execução a partir da pasta src: python -m utils.agendador [--uma-vez] [--tarefa sensores]
+if __name__ == "__main__":
+    from utils.migracoes import aplicarMigracoes
+
+    parser = argparse.ArgumentParser(description="Atualiza sensores e acessos e envia os e-mails da fila em segundo plano.")
+    parser.add_argument("--tarefa", action="append", choices=list(TAREFAS),
+                        help="Tarefa a executar (pode ser repetido; padrão: todas)")
+    parser.add_argument("--uma-vez", action="store_true",
+                        help="Executa as tarefas imediatamente uma única vez e sai")
+    args = parser.parse_args()
+
+    aplicarMigracoes()
+    rodarAgendador(args.tarefa, args.uma_vez)
@@ -0,0 +1,72 @@
+import os
+import threading
+from functools import wraps
+
+import pandas as pd
+from cachetools import TTLCache
+
+from utils.conexao import engine
+
+# Tempo de vida (s) e quantidade máxima de consultas mantidas em memória
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "128"))
+
+_cache = TTLCache(maxsize=CACHE_MAX_ENTRADAS, ttl=CACHE_TTL)
+_lock = threading.Lock()
+
+# Geração dos dados: avança a cada escrita no banco e invalida o que estava em cache
+_geracao = 0
+
+
+def invalidarCache():
+    """Avança a geração dos dados, descartando todas as consultas em cache."""
+    global _geracao
+    with _lock:
+        _geracao += 1
+        _cache.clear()
+
+
+def _congelar(valor):
+    # Converte parâmetros em uma chave hasheável e independente da ordem dos dicionários
+    if isinstance(valor, dict):
+        return tuple(sorted((chave, _congelar(item)) for chave, item in valor.items()))
+    if isinstance(valor, (list, tuple, set)):
+        return tuple(_congelar(item) for item in valor)
+    return valor
+
+
+def consultarCache(chave, calcular):
+    """Retorna o valor em cache para a chave na geração atual ou o calcula e armazena."""
+    with _lock:
+        geracao = _geracao
+        try:
+            return _cache[(geracao, chave)]
+        except KeyError:
+            pass
+
+    valor = calcular()
+
+    # Não guarda resultados calculados antes de uma escrita concorrente
+    with _lock:
+        if geracao == _geracao:
+            _cache[(geracao, chave)] = valor
+    return valor
+
+
+def lerSql(query, params=None):
+    """pd.read_sql_query com cache pela consulta e parâmetros; retorna uma cópia do DataFrame."""
+    df = consultarCache(
+        ("sql", query, _congelar(params)),
+        lambda: pd.read_sql_query(query, engine, params=params)
+    )
+    return df.copy()
+
+
+def cacheado(funcao):
+    """Cacheia o retorno da função pelos argumentos da chamada."""
+    @wraps(funcao)
+    def envolvida(*args, **kwargs):
+        chave = (funcao.__module__, funcao.__qualname__, _congelar(args), _congelar(kwargs))
+        return consultarCache(chave, lambda: funcao(*args, **kwargs))
+
+    return envolvida
@@ -0,0 +1,176 @@
+import hashlib
+import os
+
+from psycopg2.extras import execute_values
+
+from utils.conexao import obterConexao
+from utils.enviar_emails import enviarEmails
+
+# Dias em que o mesmo conjunto de sensores não é notificado de novo ao mesmo destinatário
+EMAIL_INTERVALO_REENVIO_DIAS = int(os.getenv("EMAIL_INTERVALO_REENVIO_DIAS", "7"))
+
+# Tentativas por e-mail, e-mails reservados por lote e tempo (s) até liberar um lote abandonado
+EMAIL_MAX_TENTATIVAS_FILA = int(os.getenv("EMAIL_MAX_TENTATIVAS_FILA", "5"))
+EMAIL_LOTE_FILA = int(os.getenv("EMAIL_LOTE_FILA", "50"))
+EMAIL_LIMITE_RESERVA = int(os.getenv("EMAIL_LIMITE_RESERVA", "900"))
+
+# Espera (s) antes da 2ª tentativa de um e-mail que falhou; dobra a cada nova falha
+EMAIL_ESPERA_FILA = int(os.getenv("EMAIL_ESPERA_FILA", "60"))
+
+# Dias que e-mails enviados ou com erro ficam na tabela (nunca menos que o intervalo de reenvio)
+EMAIL_RETENCAO_DIAS = max(int(os.getenv("EMAIL_RETENCAO_DIAS", "90")), EMAIL_INTERVALO_REENVIO_DIAS)
+
+# Chave do advisory lock que serializa o enfileiramento (cliques duplos simultâneos)
+CHAVE_LOCK_CAIXA_SAIDA = 7345002
+
+
+def hashSensores(subgrupo):
+    """SHA-256 do conjunto de sensores (DescriçãoSensor) de um cliente, independente da ordem."""
+    sensores = sorted(set(subgrupo["DescriçãoSensor"].astype(str)))
+    return hashlib.sha256("\x1f".join(sensores).encode("utf-8")).hexdigest()
+
+
+def enfileirarEmails(mensagens):
+    """Grava os e-mails na caixa de saída para o agendador enviar.
+
+    ``mensagens`` é uma lista de dicts com to_address, subject, content e hash_sensores.
+    Mensagens já na fila, ou cujo conjunto de sensores foi enviado ao mesmo destinatário
+    nos últimos EMAIL_INTERVALO_REENVIO_DIAS dias, são ignoradas. Retorna o conjunto de
+    pares (destinatário, hash_sensores) efetivamente enfileirados.
+    """
+    if not mensagens:
+        return set()
+
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (CHAVE_LOCK_CAIXA_SAIDA,))
+
+        enfileirados = execute_values(cursor, f"""
+            INSERT INTO caixa_saida_emails (destinatario, assunto, conteudo, hash_sensores)
+            SELECT DISTINCT ON (v.destinatario, v.hash_sensores)
+                v.destinatario, v.assunto, v.conteudo, v.hash_sensores
+            FROM (VALUES %s) AS v (destinatario, assunto, conteudo, hash_sensores)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM caixa_saida_emails c
+                WHERE c.destinatario = v.destinatario
+                  AND c.hash_sensores = v.hash_sensores
+                  AND (c.status IN ('pendente', 'enviando')
+                       OR (c.status = 'enviado'
+                           AND c.enviado_em > NOW() - make_interval(days => {EMAIL_INTERVALO_REENVIO_DIAS:d})))
+            )
+            RETURNING destinatario, hash_sensores
+        """, [
+            (m["to_address"], m["subject"], m["content"], m["hash_sensores"]) for m in mensagens
+        ], fetch=True)
+
+    return {tuple(linha) for linha in enfileirados}
+
+
+def _reservarLote(lote):
+    with obterConexao() as conn, conn.cursor() as cursor:
+        # Devolve à fila os e-mails de um worker que caiu no meio do envio
+        cursor.execute("""
+            UPDATE caixa_saida_emails
+            SET status = 'pendente'
+            WHERE status = 'enviando'
+              AND reservado_em < NOW() - make_interval(secs => %s)
+        """, (EMAIL_LIMITE_RESERVA,))
+
+        cursor.execute("""
+            UPDATE caixa_saida_emails
+            SET status = 'enviando', tentativas = tentativas + 1, reservado_em = NOW()
+            WHERE id IN (
+                SELECT id FROM caixa_saida_emails
+                WHERE status = 'pendente' AND proxima_tentativa <= NOW()
+                ORDER BY proxima_tentativa, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, destinatario, assunto, conteudo, tentativas
+        """, (lote,))
+        return cursor.fetchall()
+
+
+def caixaSaidaTemPendentes():
+    """Indica se há e-mails esperando envio."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT EXISTS (
+                SELECT 1 FROM caixa_saida_emails
+                WHERE status = 'pendente' AND proxima_tentativa <= NOW()
+            )
+        """)
+        return cursor.fetchone()[0]
+
+
+def limparCaixaSaida():
+    """Remove os e-mails finalizados há mais de EMAIL_RETENCAO_DIAS dias."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM caixa_saida_emails
+            WHERE status IN ('enviado', 'erro')
+              AND criado_em < NOW() - make_interval(days => %s)
+        """, (EMAIL_RETENCAO_DIAS,))
+
+
+def processarCaixaSaida(lote=EMAIL_LOTE_FILA):
+    """Envia os e-mails pendentes da caixa de saída, em lotes, até esvaziá-la.
+
+    Cada lote é enviado pelo pool de enviarEmails (com limite de taxa). Falhas voltam
+    para a fila, com espera crescente (EMAIL_ESPERA_FILA × 2^(tentativas-1) segundos),
+    até EMAIL_MAX_TENTATIVAS_FILA tentativas. Retorna quantos foram enviados.
+    """
+    limparCaixaSaida()
+    total_enviados = 0
+
+    while True:
+        reservados = _reservarLote(lote)
+        if not reservados:
+            return total_enviados
+
+        resultados = enviarEmails([
+            {"id": id_email, "tentativas": tentativas,
+             "to_address": destinatario, "subject": assunto, "content": conteudo}
+            for id_email, destinatario, assunto, conteudo, tentativas in reservados
+        ])
+
+        atualizacoes = []
+        for resultado in resultados:
+            if resultado["sucesso"]:
+                status = "enviado"
+            elif resultado["tentativas"] < EMAIL_MAX_TENTATIVAS_FILA:
+                status = "pendente"
+            else:
+                status = "erro"
+            espera = EMAIL_ESPERA_FILA * 2 ** (resultado["tentativas"] - 1)
+            atualizacoes.append((resultado["id"], status, resultado["erro"], espera))
+
+        with obterConexao() as conn, conn.cursor() as cursor:
+            execute_values(cursor, """
+                UPDATE caixa_saida_emails AS c
+                SET status = v.status,
+                    erro = v.erro,
+                    enviado_em = CASE WHEN v.status = 'enviado' THEN NOW() END,
+                    proxima_tentativa = NOW() + make_interval(secs => v.espera)
+                FROM (VALUES %s) AS v (id, status, erro, espera)
+                WHERE c.id = v.id
+            """, atualizacoes)
+
+        total_enviados += sum(1 for resultado in resultados if resultado["sucesso"])
+
+        # Um lote sem nenhum sucesso indica falha geral; o restante fica para a próxima execução
+        if not any(resultado["sucesso"] for resultado in resultados):
+            return total_enviados
+
+
+def resumoCaixaSaida():
+    """Quantidade, por status, dos e-mails em aberto e dos criados nas últimas 24 horas."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT status, COUNT(*) FROM (
+                SELECT id, status FROM caixa_saida_emails WHERE status IN ('pendente', 'enviando')
+                UNION
+                SELECT id, status FROM caixa_saida_emails WHERE criado_em > NOW() - INTERVAL '1 day'
+            ) recentes
+            GROUP BY status
+        """)
+        return dict(cursor.fetchall())
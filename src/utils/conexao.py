@@ -0,0 +1,55 @@
+import os
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+
+load_dotenv()
+
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+DB_NAME = os.getenv("DB_NAME")
+
+# --- Pool de conexões (um por processo, compartilhado por utils e páginas) ---
+DB_POOL_TAMANHO = int(os.getenv("DB_POOL_TAMANHO", "5"))
+DB_POOL_EXTRA = int(os.getenv("DB_POOL_EXTRA", "5"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECICLAR = int(os.getenv("DB_POOL_RECICLAR", "1800"))
+
+engine = create_engine(
+    URL.create(
+        "postgresql+psycopg2",
+        username=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=int(DB_PORT) if DB_PORT else None,
+        database=DB_NAME
+    ),
+    pool_size=DB_POOL_TAMANHO,
+    max_overflow=DB_POOL_EXTRA,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECICLAR,
+    # Testa a conexão ao retirá-la do pool e descarta as que caíram
+    pool_pre_ping=True
+)
+
+
+@contextmanager
+def obterConexao():
+    """Empresta uma conexão psycopg2 do pool.
+
+    Ao sair do bloco a transação é confirmada (ou desfeita, em caso de erro) e a
+    conexão sempre volta para o pool.
+    """
+    conn = engine.raw_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
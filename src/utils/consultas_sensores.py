@@ -0,0 +1,123 @@
+import io
+import os
+from datetime import date, timedelta
+
+from utils.cache import lerSql
+from utils.conexao import obterConexao
+
+# Colunas de historico_sensores exibidas nas consultas e relatórios
+COLUNAS_SENSORES = [
+    "id", "data_registro", "nome", "email", "descricao_sensor",
+    "ultima_leitura", "plataforma", "status", "tipo_medidor", "manutencao"
+]
+
+# Registros exibidos por página na consulta de sensores
+TAMANHO_PAGINA = 500
+
+# Registros por arquivo na exportação em CSV (limita a memória usada por download)
+CSV_LINHAS_POR_PARTE = int(os.getenv("CSV_LINHAS_POR_PARTE", "100000"))
+
+
+def _proximoMes(dia):
+    return (dia.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def montarFiltrosSensores(ano="", mes="", data_registro="", nome="", email="", plataforma=""):
+    """Monta a cláusula WHERE e os parâmetros da consulta de historico_sensores.
+
+    Ano e mês viram um intervalo sobre data_registro, e os textos são comparados
+    com ILIKE/LIKE, atendidos pelos índices trigram. Um mês fora de 1 a 12 não
+    encontra nenhum registro.
+    """
+    condicoes = []
+    params = {}
+
+    if mes and not 1 <= int(mes) <= 12:
+        return "FALSE", params
+
+    if ano:
+        inicio = date(int(ano), int(mes) if mes else 1, 1)
+        fim = _proximoMes(inicio) if mes else date(int(ano) + 1, 1, 1)
+        condicoes.append("data_registro >= %(inicio)s AND data_registro < %(fim)s")
+        params["inicio"] = inicio
+        params["fim"] = fim
+    elif mes:
+        # Mês sem ano não corresponde a um único intervalo de datas
+        condicoes.append("EXTRACT(MONTH FROM data_registro) = %(mes)s")
+        params["mes"] = int(mes)
+
+    if data_registro:
+        condicoes.append("data_registro = %(data_registro)s")
+        params["data_registro"] = data_registro
+    if nome:
+        condicoes.append("nome ILIKE %(nome)s")
+        params["nome"] = f"%{nome}%"
+    if email:
+        condicoes.append("email ILIKE %(email)s")
+        params["email"] = f"%{email}%"
+    if plataforma:
+        condicoes.append("plataforma_norm LIKE %(plataforma)s")
+        params["plataforma"] = f"%{plataforma.lower()}%"
+
+    return " AND ".join(condicoes) or "TRUE", params
+
+
+def consultaPaginaSensores(where, params, apos=None, limite=TAMANHO_PAGINA):
+    """Monta o SQL e os parâmetros de uma página da consulta (ver buscarPaginaSensores)."""
+    params = dict(params)
+    if apos is not None:
+        where = f"({where}) AND (data_registro, id) > (%(apos_data)s, %(apos_id)s)"
+        params["apos_data"], params["apos_id"] = apos
+    params["limite"] = limite
+
+    return f"""
+        SELECT {', '.join(COLUNAS_SENSORES)}
+        FROM historico_sensores
+        WHERE {where}
+        ORDER BY data_registro, id
+        LIMIT %(limite)s
+    """, params
+
+
+def buscarPaginaSensores(where, params, apos=None, limite=TAMANHO_PAGINA):
+    """Busca até ``limite`` registros ordenados por (data_registro, id) após a chave ``apos``.
+
+    A paginação por chave (keyset) usa o índice (data_registro, id), então o custo de
+    cada página não depende de quantas páginas vieram antes.
+    """
+    return lerSql(*consultaPaginaSensores(where, params, apos, limite))
+
+
+def dividirExportacao(where, params, linhas_por_parte=CSV_LINHAS_POR_PARTE):
+    """Chaves ``apos`` (ver buscarPaginaSensores) em que começa cada parte da exportação.
+
+    A primeira parte começa em None; as demais, a cada ``linhas_por_parte`` registros.
+    """
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT data_registro, id FROM (
+                SELECT data_registro, id,
+                       ROW_NUMBER() OVER (ORDER BY data_registro, id) AS posicao,
+                       COUNT(*) OVER () AS total
+                FROM historico_sensores
+                WHERE {where}
+            ) numerados
+            WHERE posicao %% %(linhas_por_parte)s = 0 AND posicao < total
+            ORDER BY data_registro, id
+        """, {**params, "linhas_por_parte": linhas_por_parte})
+        return [None] + [tuple(linha) for linha in cursor.fetchall()]
+
+
+def exportarCsvSensores(where, params, apos=None, limite=CSV_LINHAS_POR_PARTE):
+    """CSV (bytes) com até ``limite`` registros da consulta após a chave ``apos``.
+
+    O COPY ... TO STDOUT envia as linhas direto para o buffer, sem montar um DataFrame;
+    a memória usada fica limitada ao tamanho de uma parte.
+    """
+    with obterConexao() as conn, conn.cursor() as cursor:
+        consulta = cursor.mogrify(*consultaPaginaSensores(where, params, apos, limite)).decode()
+
+        buffer = io.BytesIO()
+        cursor.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT csv, HEADER)", buffer)
+
+    return buffer.getvalue()
@@ -1,11 +1,16 @@
+import io
 import os
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 import pandas as pd
-import psycopg2
 from dateutil.utils import today
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from psycopg2.extras import execute_values
+
+from utils.cache import cacheado, invalidarCache
+from utils.conexao import obterConexao
+from utils.consultas_sensores import COLUNAS_SENSORES
+from utils.snapshot import hashConteudo, lerSnapshot
 
 load_dotenv()
 
@@ -19,250 +24,404 @@ os.makedirs(DATABASE_DIR, exist_ok=True)
 os.makedirs(TABELAS_DIR, exist_ok=True)
 os.makedirs(RELATORIOS_DIR, exist_ok=True)
 
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-
-
-def get_connection():
-    return psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
-
-
-def salvarTabela(arquivo):
-    conn = get_connection()
-    cursor = conn.cursor()
-    df = pd.read_excel(arquivo)
-
-    df['DataAtual'] = pd.to_datetime(df['DataAtual'], dayfirst=True).dt.strftime('%Y-%m-%d')
-    df['DataÚltimaLeitura'] = pd.to_datetime(df['DataÚltimaLeitura'], dayfirst=True).dt.strftime('%Y-%m-%d')
-
-    df.rename(columns={
-        "DataAtual": "data_registro",
-        "Nome": "nome",
-        "Email": "email",
-        "DescriçãoSensor": "descricao_sensor",
-        "DataÚltimaLeitura": "ultima_leitura",
-        "Plataforma": "plataforma",
-        "Dias off.": "dias_off",
-        "TipoMedidor": "tipo_medidor",
-        "Manutencao": "manutencao"
-    }, inplace=True)
-
-    # --- Criar tabela se não existir ---
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS historico_sensores (
-            id SERIAL PRIMARY KEY,
-            data_registro DATE NOT NULL,
-            nome TEXT NOT NULL,
-            email TEXT NOT NULL,
-            descricao_sensor TEXT NOT NULL,
-            ultima_leitura DATE,
-            plataforma TEXT,
-            status TEXT,
-            tipo_medidor TEXT,
-            manutencao TEXT,
-            UNIQUE(data_registro, nome, descricao_sensor)
-        )
-    """)
-
-    conn.commit()
-
-    # --- Inserir dados novos evitando duplicados ---
-    for _, row in df.iterrows():
+# Chave do advisory lock que serializa a reescrita dos relatórios mensais entre processos
+CHAVE_LOCK_RELATORIOS = 7345003
+
+# Linhas enviadas por comando COPY na carga em lote
+TAMANHO_LOTE_COPY = 50000
+
+# Linhas por comando nos upserts em lote (execute_values)
+TAMANHO_LOTE_UPSERT = 1000
+
+COLUNAS_HISTORICO_SENSORES = [
+    "data_registro", "nome", "descricao_sensor", "email", "ultima_leitura",
+    "plataforma", "tipo_medidor", "status", "manutencao"
+]
+
+
+# Hashes já confirmados no controle de ingestões (evita consultar o banco a cada rerun)
+_ingestoes_confirmadas = set()
+
+
+def salvarTabela(arquivo, hash_conteudo=None):
+    """Grava no histórico a tabela de sensores (DataFrame, snapshot ou planilha Excel).
+
+    Conteúdos já registrados no controle de ingestões são ignorados; retorna True
+    apenas quando houve gravação.
+    """
+    if hash_conteudo is None:
+        hash_conteudo = hashConteudo(arquivo)
+
+    if hash_conteudo in _ingestoes_confirmadas:
+        return False
+
+    with obterConexao() as conn, conn.cursor() as cursor:
+        # --- Conteúdo já gravado anteriormente ---
+        cursor.execute("SELECT 1 FROM ingestoes WHERE hash_conteudo = %s", (hash_conteudo,))
+        if cursor.fetchone():
+            _ingestoes_confirmadas.add(hash_conteudo)
+            return False
+
+        df = arquivo.copy() if isinstance(arquivo, pd.DataFrame) else lerSnapshot(arquivo)
+
+        df['DataAtual'] = pd.to_datetime(df['DataAtual'], dayfirst=True).dt.strftime('%Y-%m-%d')
+        df['DataÚltimaLeitura'] = pd.to_datetime(df['DataÚltimaLeitura'], dayfirst=True).dt.strftime('%Y-%m-%d')
+
+        df.rename(columns={
+            "DataAtual": "data_registro",
+            "Nome": "nome",
+            "Email": "email",
+            "DescriçãoSensor": "descricao_sensor",
+            "DataÚltimaLeitura": "ultima_leitura",
+            "Plataforma": "plataforma",
+            "Dias off.": "dias_off",
+            "TipoMedidor": "tipo_medidor",
+            "Manutencao": "manutencao"
+        }, inplace=True)
+
+        # --- Inserir dados novos evitando duplicados ---
+        df["status"] = df["dias_off"].gt(0).map({True: "OFF", False: "ON"})
+        if "plataforma" not in df.columns:
+            df["plataforma"] = ""
+
         cursor.execute("""
-                INSERT INTO historico_sensores (
-                    data_registro, nome, descricao_sensor, email, ultima_leitura, plataforma, tipo_medidor, status, manutencao
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (data_registro, nome, descricao_sensor) DO UPDATE
-                SET 
-                ultima_leitura = EXCLUDED.ultima_leitura, 
-                status = EXCLUDED.status, 
-                manutencao = EXCLUDED.manutencao
-            """, (
-            row["data_registro"],
-            row["nome"],
-            row["descricao_sensor"],
-            row["email"],
-            row.get("ultima_leitura", None),
-            row.get("plataforma", ""),
-            row["tipo_medidor"],
-            "OFF" if row["dias_off"] > 0 else "ON",
-            row["manutencao"]
-        ))
-
-    conn.commit()
-
-    # Gerar relatório
-    ano = str(pd.Timestamp.today().year)
-    mes = str(pd.Timestamp.today().month).zfill(2)
-
-    engine = create_engine(f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-    df_mensal = pd.read_sql_query("SELECT * FROM historico_sensores ORDER BY data_registro ASC", engine)
-
-    nome_relatorio = os.path.join(RELATORIOS_DIR, f"historico_{ano}_{mes}.xlsx")
-    df_mensal.to_excel(nome_relatorio, index=False)
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-
-def criarTabelasAcesso():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios (
-            id SERIAL PRIMARY KEY,
-            nome TEXT NOT NULL,
-            email TEXT NOT NULL,
-            cliente_ativo BOOLEAN,
-            plataforma TEXT,
-            UNIQUE(email, plataforma)
-        );
+            CREATE TEMP TABLE staging_historico_sensores (
+                ordem BIGSERIAL,
+                data_registro DATE,
+                nome TEXT,
+                descricao_sensor TEXT,
+                email TEXT,
+                ultima_leitura DATE,
+                plataforma TEXT,
+                tipo_medidor TEXT,
+                status TEXT,
+                manutencao TEXT
+            ) ON COMMIT DROP
         """)
 
-    cursor.execute("""
-            CREATE TABLE IF NOT EXISTS historico_acesso (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-            data_registro DATE NOT NULL,
-            acessos INTEGER,
-            mes TEXT,
-            UNIQUE(user_id, mes)
-        );
+        copiarParaTabela(cursor, "staging_historico_sensores", df, COLUNAS_HISTORICO_SENSORES)
+
+        dias_gravados = list(df["data_registro"].dropna().unique())
+        garantirParticoes(cursor, dias_gravados)
+
+        # Em caso de linhas repetidas no arquivo, vale a última (como no upsert linha a linha)
+        colunas = ", ".join(COLUNAS_HISTORICO_SENSORES)
+        cursor.execute(f"""
+            INSERT INTO historico_sensores ({colunas})
+            SELECT DISTINCT ON (data_registro, nome, descricao_sensor) {colunas}
+            FROM staging_historico_sensores
+            ORDER BY data_registro, nome, descricao_sensor, ordem DESC
+            ON CONFLICT (data_registro, nome, descricao_sensor) DO UPDATE
+            SET
+            ultima_leitura = EXCLUDED.ultima_leitura,
+            status = EXCLUDED.status,
+            manutencao = EXCLUDED.manutencao
         """)
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        # Atualiza o resumo diário apenas nos dias gravados
+        atualizarResumoDiario(cursor, dias_gravados)
 
+        # Registra o conteúdo na mesma transação dos dados
+        cursor.execute("""
+            INSERT INTO ingestoes (hash_conteudo, linhas) VALUES (%s, %s)
+            ON CONFLICT (hash_conteudo) DO NOTHING
+        """, (hash_conteudo, len(df)))
 
-def salvarUsuarios(usuarios):
-    conn = get_connection()
-    cursor = conn.cursor()
-    criarTabelasAcesso()
+    invalidarCache()
+    _ingestoes_confirmadas.add(hash_conteudo)
 
-    for usuario in usuarios:
-        cursor.execute("""
-                        INSERT INTO usuarios (
-                            nome, email, cliente_ativo, plataforma
-                        ) VALUES (%s, %s, %s, %s)
-                        ON CONFLICT DO NOTHING
-                    """, (
-            usuario["nome"],
-            usuario["email"],
-            usuario["cliente_ativo"],
-            usuario["plataforma"]
-        ))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # O relatório só é reescrito com os dados já confirmados no banco
+    atualizarRelatorioMensal(dias_gravados)
+    return True
 
 
-def salvarMetricas(metricas):
-    conn = get_connection()
-    cursor = conn.cursor()
-    criarTabelasAcesso()
+def garantirParticoes(cursor, dias, tabela="historico_sensores"):
+    """Cria as partições mensais historico_sensores_AAAA_MM que ainda não existem para os dias informados."""
+    meses = sorted({date(dia.year, dia.month, 1) for dia in pd.to_datetime(pd.Series(dias)).dt.date})
 
-    for metrica in metricas:
-        data_registro = today().strftime("%Y-%m-%d")
-        cursor.execute("SELECT id FROM usuarios WHERE email = %s", (metrica["email"],))
-        result = cursor.fetchone()
+    for inicio_mes in meses:
+        particao = f"historico_sensores_{inicio_mes:%Y_%m}"
 
-        if not result:
-            print(f"Usuário não encontrado: {metrica['email']}")
+        # Evita o lock na tabela principal quando a partição já existe
+        cursor.execute("SELECT to_regclass(%s)", (particao,))
+        if cursor.fetchone()[0] is not None:
             continue
 
-        user_id = result[0]
+        fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {particao}
+            PARTITION OF {tabela}
+            FOR VALUES FROM ('{inicio_mes}') TO ('{fim_mes}')
+        """)
 
-        for acesso in metrica.get("acessos_por_mes", []):
-            cursor.execute("""
-                        INSERT INTO historico_acesso (
-                            user_id, data_registro, acessos, mes
-                        ) VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (user_id, mes) DO UPDATE
-                        SET acessos = EXCLUDED.acessos
-                    """, (
-                user_id,
-                data_registro,
-                acesso["access"],
-                acesso["month"]
-            ))
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+def arquivarMesHistorico(ano, mes):
+    """Desanexa a partição do mês de historico_sensores, mantendo-a como historico_sensores_arquivo_AAAA_MM.
+
+    Os dados deixam de aparecer nas consultas sem um DELETE; o resumo diário do mês é mantido.
+    """
+    particao = f"historico_sensores_{ano}_{mes:02d}"
+
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE historico_sensores DETACH PARTITION {particao}")
+        cursor.execute(f"ALTER TABLE {particao} RENAME TO historico_sensores_arquivo_{ano}_{mes:02d}")
+
+    invalidarCache()
+
+
+def atualizarResumoDiario(cursor, dias=None):
+    """Recalcula em resumo_diario_status as contagens ON/OFF dos dias informados (todos, se None).
+
+    Usa as mesmas regras do gráfico de status: OFF quando o sensor não está em
+    manutenção e está há mais de um dia sem leitura.
+    """
+    filtro_dias = "AND data_registro = ANY(%(dias)s::date[])" if dias is not None else ""
+    parametros = {"dias": [str(dia) for dia in dias]} if dias is not None else {}
+
+    cursor.execute(f"""
+        DELETE FROM resumo_diario_status
+        WHERE TRUE {filtro_dias}
+    """, parametros)
+
+    cursor.execute(f"""
+        INSERT INTO resumo_diario_status (data_registro, plataforma, tipo_medidor, on_count, off_count)
+        SELECT
+            data_registro,
+            plataforma,
+            tipo_medidor,
+            COUNT(1) FILTER (
+                WHERE LOWER(manutencao) = 'false'
+                   OR (LOWER(manutencao) != 'false' AND (data_registro - ultima_leitura) < 2)
+            ),
+            COUNT(1) FILTER (
+                WHERE LOWER(manutencao) != 'false' AND (data_registro - ultima_leitura) > 1
+            )
+        FROM historico_sensores
+        WHERE plataforma IS NOT NULL
+          AND tipo_medidor IS NOT NULL
+          {filtro_dias}
+        GROUP BY data_registro, plataforma, tipo_medidor
+    """, parametros)
+
+
+def atualizarRelatorioMensal(dias):
+    """Atualiza relatorios/historico_{ano}_{mes}.parquet de cada mês afetado.
+
+    Quando o relatório do mês já existe, só os dias informados são consultados e
+    substituídos; caso contrário ele é montado a partir do mês inteiro. Deve ser
+    chamada depois do commit; o advisory lock impede que duas ingestões (página e
+    agendador) reescrevam o mesmo arquivo ao mesmo tempo.
+    """
+    dias = sorted(set(pd.to_datetime(pd.Series(dias)).dt.date))
+
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (CHAVE_LOCK_RELATORIOS,))
+
+        for ano, mes in sorted({(dia.year, dia.month) for dia in dias}):
+            _reescreverRelatorioMes(cursor, ano, mes, [dia for dia in dias if (dia.year, dia.month) == (ano, mes)])
+
+
+def _reescreverRelatorioMes(cursor, ano, mes, dias_mes):
+    caminho = os.path.join(RELATORIOS_DIR, f"historico_{ano}_{mes:02d}.parquet")
+    existente = pd.read_parquet(caminho) if os.path.exists(caminho) else None
+
+    if existente is None:
+        inicio_mes = date(ano, mes, 1)
+        fim_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
+        cursor.execute(f"""
+            SELECT {', '.join(COLUNAS_SENSORES)} FROM historico_sensores
+            WHERE data_registro >= %s AND data_registro < %s
+            ORDER BY data_registro, id
+        """, (inicio_mes, fim_mes))
+    else:
+        cursor.execute(f"""
+            SELECT {', '.join(COLUNAS_SENSORES)} FROM historico_sensores
+            WHERE data_registro = ANY(%s)
+            ORDER BY data_registro, id
+        """, (dias_mes,))
+
+    df_mes = pd.DataFrame(cursor.fetchall(), columns=[coluna[0] for coluna in cursor.description])
+
+    if existente is not None:
+        existente = existente[~existente["data_registro"].isin(dias_mes)]
+        df_mes = pd.concat([existente, df_mes], ignore_index=True).sort_values(["data_registro", "id"])
+
+    temporario = f"{caminho}.tmp"
+    df_mes.to_parquet(temporario, index=False, engine="pyarrow")
+    os.replace(temporario, caminho)
+
+
+def copiarParaTabela(cursor, tabela, df, colunas):
+    """Envia as colunas do DataFrame para a tabela via COPY FROM STDIN, em lotes de CSV."""
+    comando = f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+    for inicio in range(0, len(df), TAMANHO_LOTE_COPY):
+        buffer = io.StringIO()
+        df.iloc[inicio:inicio + TAMANHO_LOTE_COPY].to_csv(
+            buffer, columns=colunas, index=False, header=False, na_rep="\\N")
+        buffer.seek(0)
+        cursor.copy_expert(comando, buffer)
 
 
-def buscarMetricasPorMes(timestamp_data_fim):
-    conn = get_connection()
-    cursor = conn.cursor()
-    criarTabelasAcesso()
+def salvarUsuarios(usuarios):
+    with obterConexao() as conn, conn.cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO usuarios (
+                nome, email, cliente_ativo, plataforma
+            ) VALUES %s
+            ON CONFLICT DO NOTHING
+        """, [
+            (usuario["nome"], usuario["email"], usuario["cliente_ativo"], usuario["plataforma"])
+            for usuario in usuarios
+        ], page_size=TAMANHO_LOTE_UPSERT)
+
+    invalidarCache()
+
 
+def salvarMetricas(metricas):
+    """Grava os acessos mensais de cada usuário em lote, cadastrando os usuários que faltarem."""
+    if not metricas:
+        return
+
+    data_registro = today().strftime("%Y-%m-%d")
+
+    # Um registro por usuário
+    usuarios = {(metrica["email"], metrica["plataforma"]): metrica for metrica in metricas}
+
+    with obterConexao() as conn, conn.cursor() as cursor:
+        # Usuários já cadastrados não são regravados; os ids de todos vêm da consulta seguinte
+        execute_values(cursor, """
+            INSERT INTO usuarios (
+                nome, email, cliente_ativo, plataforma
+            ) VALUES %s
+            ON CONFLICT (email, plataforma) DO NOTHING
+        """, [
+            (usuario["nome"], usuario["email"], usuario["cliente_ativo"], usuario["plataforma"])
+            for usuario in usuarios.values()
+        ], page_size=TAMANHO_LOTE_UPSERT)
+
+        cursor.execute("""
+            SELECT id, email, plataforma FROM usuarios
+            WHERE email = ANY(%s)
+        """, (list({email for email, _ in usuarios}),))
+        id_por_usuario = {(email, plataforma): user_id for user_id, email, plataforma in cursor.fetchall()}
+
+        acessos = {}
+        for metrica in metricas:
+            user_id = id_por_usuario[(metrica["email"], metrica["plataforma"])]
+            for acesso in metrica.get("acessos_por_mes", []):
+                acessos[(user_id, acesso["month"])] = (user_id, data_registro, acesso["access"], acesso["month"])
+
+        execute_values(cursor, """
+            INSERT INTO historico_acesso (
+                user_id, data_registro, acessos, mes
+            ) VALUES %s
+            ON CONFLICT (user_id, mes) DO UPDATE
+            SET acessos = EXCLUDED.acessos
+        """, list(acessos.values()), page_size=TAMANHO_LOTE_UPSERT)
+
+    invalidarCache()
+
+
+@cacheado
+def buscarMetricasPorMes(timestamp_data_fim):
     mes = timestampParaMes(timestamp_data_fim)
 
-    cursor.execute("SELECT * FROM historico_acesso WHERE mes = %s", (str(mes),))
-    result = cursor.fetchall()
-    cursor.close()
-    return result
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT * FROM historico_acesso WHERE mes = %s", (mes,))
+        return cursor.fetchall()
 
-def buscarTodasAsMetricas():
-    conn = get_connection()
-    cursor = conn.cursor()
-    criarTabelasAcesso()
 
-    cursor.execute("SELECT * FROM historico_acesso")
-    result = cursor.fetchall()
-    cursor.close()
-    return result
+@cacheado
+def buscarTodasAsMetricas():
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT * FROM historico_acesso")
+        return cursor.fetchall()
 
 
+@cacheado
 def buscarMetricasComUsuarios(inicio, fim):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT 
-            u.id,
-            u.nome,
-            u.email,
-            u.cliente_ativo,
-            ha.mes,
-            ha.acessos
-        FROM historico_acesso ha
-        INNER JOIN usuarios u ON u.id = ha.user_id
-        WHERE to_date(ha.mes, 'MM/YYYY') BETWEEN to_date(%s, 'MM/YYYY') AND to_date(%s, 'MM/YYYY')
-        ORDER BY u.nome ASC, to_date(ha.mes, 'MM/YYYY')
-    """, (inicio, fim))
-
-    result = cursor.fetchall()
-    cursor.close()
-    return result
+    """Acessos por usuário entre os meses ``inicio`` e ``fim`` (datas do primeiro dia do mês)."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT 
+                u.id,
+                u.nome,
+                u.email,
+                u.cliente_ativo,
+                ha.mes,
+                ha.acessos
+            FROM historico_acesso ha
+            INNER JOIN usuarios u ON u.id = ha.user_id
+            WHERE ha.mes BETWEEN %s AND %s
+            ORDER BY u.nome ASC, ha.mes
+        """, (inicio, fim))
+
+        return cursor.fetchall()
+
 
 def alternarStatusUsuario(user_id, status):
-    conn = get_connection()
-    cursor = conn.cursor()
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            UPDATE usuarios
+            SET cliente_ativo = %s
+            WHERE id = %s
+        """, (status, user_id))
+
+    invalidarCache()
+
+
+def buscarUsuariosSincronizacao(plataforma="LiteMe"):
+    """Usuários cadastrados da plataforma com o último mês de acessos já sincronizado (ou None)."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT u.nome, u.email, u.plataforma, u.cliente_ativo, s.ultimo_mes
+            FROM usuarios u
+            LEFT JOIN sincronizacao_acessos s ON s.user_id = u.id
+            WHERE u.plataforma = %s
+        """, (plataforma,))
+
+        colunas = [coluna[0] for coluna in cursor.description]
+        return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+
+def salvarMarcasSincronizacao(emails, ultimo_mes, plataforma="LiteMe"):
+    """Avança para ``ultimo_mes`` a marca de sincronização dos usuários informados."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO sincronizacao_acessos (user_id, ultimo_mes)
+            SELECT id, %(ultimo_mes)s
+            FROM usuarios
+            WHERE plataforma = %(plataforma)s AND email = ANY(%(emails)s)
+            ON CONFLICT (user_id) DO UPDATE
+            SET ultimo_mes = GREATEST(sincronizacao_acessos.ultimo_mes, EXCLUDED.ultimo_mes),
+                atualizado_em = NOW()
+        """, {"ultimo_mes": ultimo_mes, "plataforma": plataforma, "emails": list(emails)})
+
+
+def buscarEmailsSemMedidor(dias):
+    """Emails de acessos já conferidos na lista de medidores nos últimos ``dias`` sem dono encontrado."""
+    with obterConexao() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT email FROM emails_sem_medidor
+            WHERE verificado_em > NOW() - make_interval(days => %s)
+        """, (dias,))
+        return {linha[0] for linha in cursor.fetchall()}
+
+
+def salvarEmailsSemMedidor(emails):
+    """Registra os emails que não pertencem a nenhum dono de medidor."""
+    if not emails:
+        return
 
-    cursor.execute("""
-        UPDATE usuarios
-        SET cliente_ativo = %s
-        WHERE id = %s
-    """, (status, user_id))
+    with obterConexao() as conn, conn.cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO emails_sem_medidor (email) VALUES %s
+            ON CONFLICT (email) DO UPDATE SET verificado_em = NOW()
+        """, [(email,) for email in emails])
 
-    conn.commit()
-    cursor.close()
-    conn.close()
 
 def timestampParaMes(timestamp_ms):
+    """Retorna o primeiro dia do mês do timestamp (valor gravado em historico_acesso.mes)."""
     data = datetime.fromtimestamp(timestamp_ms / 1000)
-    return data.date().strftime("%m/%Y")
+    return data.date().replace(day=1)
@@ -1,7 +1,13 @@
-import subprocess
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -15,44 +21,192 @@ REFRESH_TOKEN = os.getenv("REFRESH_TOKEN")
 ACCESS_TOKEN  = os.getenv("ACCESS_TOKEN")
 ACCOUNT_ID = os.getenv("ACCOUNT_ID")
 
-def refresh_access_token():
-    """Renova o access_token usando o refresh_token"""
-    global ACCESS_TOKEN
-    cmd = [
-        "curl",
-        "-X", "POST",
-        "https://accounts.zoho.com/oauth/v2/token",
-        "-d", f"grant_type=refresh_token",
-        "-d", f"client_id={CLIENT_ID}",
-        "-d", f"client_secret={CLIENT_SECRET}",
-        "-d", f"refresh_token={REFRESH_TOKEN}"
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    data = json.loads(result.stdout)
+# Endereços da API do Zoho (configuráveis para apontar para um servidor local nos testes)
+ZOHO_ACCOUNTS_URL = os.getenv("ZOHO_ACCOUNTS_URL", "https://accounts.zoho.com").rstrip("/")
+ZOHO_MAIL_URL = os.getenv("ZOHO_MAIL_URL", "https://mail.zoho.com").rstrip("/")
+EMAIL_REMETENTE = os.getenv("EMAIL_REMETENTE", "suporte02@liteme.com.br")
+
+# Timeout (s) de cada chamada, tentativas por e-mail e espera base (s) do backoff exponencial
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "30"))
+EMAIL_TENTATIVAS = int(os.getenv("EMAIL_TENTATIVAS", "3"))
+EMAIL_ESPERA_BASE = float(os.getenv("EMAIL_ESPERA_BASE", "1"))
+EMAIL_MAX_CONEXOES = int(os.getenv("EMAIL_MAX_CONEXOES", "10"))
+
+# Envio em lote: e-mails simultâneos e limite de envios por segundo (cota do provedor)
+EMAIL_MAX_PARALELO = int(os.getenv("EMAIL_MAX_PARALELO", "8"))
+EMAIL_LIMITE_POR_SEGUNDO = float(os.getenv("EMAIL_LIMITE_POR_SEGUNDO", "5"))
+
+# Respostas em que o Zoho recusou o envio por sobrecarga; só elas são repetidas, pois
+# um timeout de leitura ou outro 5xx pode ocorrer com a mensagem já aceita
+STATUS_REPETIR = {429, 503}
+
+# --- Sessão keep-alive e token OAuth compartilhados por todas as threads ---
+_sessao = requests.Session()
+_adaptador = HTTPAdapter(pool_connections=2, pool_maxsize=EMAIL_MAX_CONEXOES)
+_sessao.mount("http://", _adaptador)
+_sessao.mount("https://", _adaptador)
+
+_lock_token = threading.Lock()
+_expiracao_token = None
+
+_lock_taxa = threading.Lock()
+_proximo_envio = 0.0
+
+
+def _tokenValido():
+    # Chamada com _lock_token adquirido
+    return bool(ACCESS_TOKEN) and (_expiracao_token is None or _expiracao_token > time.time())
+
+
+def _renovarToken():
+    # Chamada com _lock_token adquirido, para que só uma thread renove por vez
+    global ACCESS_TOKEN, _expiracao_token
+
+    resposta = _sessao.post(
+        f"{ZOHO_ACCOUNTS_URL}/oauth/v2/token",
+        data={
+            "grant_type": "refresh_token",
+            "client_id": CLIENT_ID,
+            "client_secret": CLIENT_SECRET,
+            "refresh_token": REFRESH_TOKEN
+        },
+        timeout=EMAIL_TIMEOUT
+    )
+    resposta.raise_for_status()
+    data = resposta.json()
+
+    if "access_token" not in data:
+        raise RuntimeError(f"Falha ao renovar o access token: {data.get('error', data)}")
+
     ACCESS_TOKEN = data["access_token"]
+    # Renova um minuto antes da expiração informada pelo Zoho
+    _expiracao_token = time.time() + int(data.get("expires_in", 3600)) - 60
     print("Access token renovado!")
+    return ACCESS_TOKEN
+
+
+def refresh_access_token(token_rejeitado=None):
+    """Renova o access_token usando o refresh_token.
+
+    Só uma thread renova por vez: quem chega com um ``token_rejeitado`` que já foi
+    substituído por um token válido recebe o novo sem fazer outra chamada.
+    """
+    with _lock_token:
+        if token_rejeitado is not None and ACCESS_TOKEN != token_rejeitado and _tokenValido():
+            return ACCESS_TOKEN
+        return _renovarToken()
+
+
+def obterAccessToken():
+    """Token em uso, renovado antes (por uma única thread) se não houver token ou se ele expirou."""
+    with _lock_token:
+        if _tokenValido():
+            return ACCESS_TOKEN
+        return _renovarToken()
+
+
+def _tokenRejeitado(resposta):
+    if resposta.status_code == 401:
+        return True
+    return "authFail" in resposta.text or "INVALID_OAUTHTOKEN" in resposta.text
+
+
+def _falhouAntesDoEnvio(erro):
+    # Timeout ou recusa ao abrir a conexão (inclui falha de DNS): o pedido não chegou a ser enviado.
+    # Demais erros de conexão (ex.: servidor fechou a conexão após receber o corpo) podem
+    # ocorrer com a mensagem já aceita
+    if isinstance(erro, requests.ConnectTimeout):
+        return True
+    causa = erro.args[0] if erro.args else None
+    return isinstance(causa, MaxRetryError) and isinstance(causa.reason, NewConnectionError)
+
 
 def send_email(to_address, subject, content):
-    """Envia e-mail usando a API do Zoho Mail"""
-    cmd = [
-        "curl",
-        "-X", "POST",
-        f"https://mail.zoho.com/api/accounts/{ACCOUNT_ID}/messages",
-        "-H", f"Authorization: Zoho-oauthtoken {ACCESS_TOKEN}",
-        "-H", "Content-Type: application/json",
-        "-d", json.dumps({
-            "fromAddress": "suporte02@liteme.com.br",
-            "toAddress": to_address,
-            "subject": subject,
-            "content": content
-        })
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if "authFail" in result.stdout or "INVALID_OAUTHTOKEN" in result.stdout:
-        print("Token expirado! Renovando...")
-        refresh_access_token()
-        send_email(to_address, subject, content)  # tenta de novo
-    else:
-        print("E-mail enviado com sucesso!")
-        print(result.stdout)
+    """Envia e-mail usando a API do Zoho Mail.
+
+    Cada tentativa respeita EMAIL_LIMITE_POR_SEGUNDO. Renova o token quando ele é recusado
+    e, até EMAIL_TENTATIVAS vezes e com backoff exponencial, repete apenas falhas em que a
+    mensagem certamente não foi aceita (conexão não estabelecida, 429 e 503). Retorna o
+    JSON da resposta e levanta exceção se o envio não for aceito.
+    """
+    payload = {
+        "fromAddress": EMAIL_REMETENTE,
+        "toAddress": to_address,
+        "subject": subject,
+        "content": content
+    }
+
+    ultimo_erro = None
+    for tentativa in range(EMAIL_TENTATIVAS):
+        if tentativa:
+            time.sleep(EMAIL_ESPERA_BASE * 2 ** (tentativa - 1))
+
+        _aguardarVez()
+        token = obterAccessToken()
+        try:
+            resposta = _sessao.post(
+                f"{ZOHO_MAIL_URL}/api/accounts/{ACCOUNT_ID}/messages",
+                headers={"Authorization": f"Zoho-oauthtoken {token}"},
+                json=payload,
+                timeout=EMAIL_TIMEOUT
+            )
+        except requests.ConnectionError as e:
+            # Se o pedido pode ter sido aceito, repetir arriscaria um e-mail duplicado
+            if not _falhouAntesDoEnvio(e):
+                raise
+            ultimo_erro = e
+            continue
+
+        if _tokenRejeitado(resposta):
+            print("Token expirado! Renovando...")
+            refresh_access_token(token)
+            ultimo_erro = RuntimeError(f"Token recusado pelo Zoho Mail: {resposta.text}")
+            continue
+
+        if resposta.status_code in STATUS_REPETIR:
+            ultimo_erro = RuntimeError(f"Zoho Mail respondeu {resposta.status_code}: {resposta.text}")
+            continue
+
+        resposta.raise_for_status()
+        print(f"E-mail enviado com sucesso para {to_address}!")
+        return resposta.json()
+
+    raise RuntimeError(f"Não foi possível enviar o e-mail para {to_address} "
+                       f"após {EMAIL_TENTATIVAS} tentativas: {ultimo_erro}")
+
+
+def _aguardarVez():
+    # Espaça os envios de todas as threads em 1/EMAIL_LIMITE_POR_SEGUNDO segundos
+    global _proximo_envio
+    if EMAIL_LIMITE_POR_SEGUNDO <= 0:
+        return
+
+    with _lock_taxa:
+        agora = time.monotonic()
+        vez = max(agora, _proximo_envio)
+        _proximo_envio = vez + 1 / EMAIL_LIMITE_POR_SEGUNDO
+
+    if vez > agora:
+        time.sleep(vez - agora)
+
+
+def _enviarCapturandoErro(mensagem):
+    try:
+        send_email(mensagem["to_address"], mensagem["subject"], mensagem["content"])
+    except Exception as e:
+        return {**mensagem, "sucesso": False, "erro": str(e)}
+    return {**mensagem, "sucesso": True, "erro": None}
+
+
+def enviarEmails(mensagens, max_paralelo=EMAIL_MAX_PARALELO):
+    """Envia vários e-mails em paralelo, respeitando EMAIL_LIMITE_POR_SEGUNDO.
+
+    ``mensagens`` é uma lista de dicts com to_address, subject e content (demais chaves
+    são repassadas ao resultado). Retorna, na mesma ordem, cada mensagem com as
+    chaves "sucesso" e "erro"; a falha de um destinatário não interrompe os demais.
+    """
+    if not mensagens:
+        return []
 
+    with ThreadPoolExecutor(max_workers=min(max_paralelo, len(mensagens)), thread_name_prefix="email") as executor:
+        return list(executor.map(_enviarCapturandoErro, mensagens))
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+# Colunas de identificação do sensor e seus nomes na tabela do histórico
+COLUNAS_SENSOR = {
+    "descricao_sensor": "Tag",
+    "nome": "Nome",
+    "plataforma": "Plataforma",
+    "tipo_medidor": "Tipo medidor",
+    "manutencao": "Manutenção"
+}
+
+SEM_REGISTRO = "—"
+
+# Status de cada dia guardado como int8; o texto só é gerado para exibição
+CODIGO_SEM_REGISTRO = 0
+CODIGO_ON = 1
+CODIGO_OFF = 2
+ROTULOS_STATUS = np.array([SEM_REGISTRO, "ON", "OFF"], dtype=object)
+
+# Rótulos com a cor embutida, exibidos sem estilo por célula
+ROTULOS_STATUS_EMOJI = np.array([SEM_REGISTRO, "🟢 ON", "🔴 OFF"], dtype=object)
+
+# Sensores exibidos por página na tabela do histórico
+TAMANHO_PAGINA_HISTORICO = 200
+
+# Modos do filtro por status da página de histórico
+FILTROS_STATUS = ["Todos com Variações", "Todos ON", "Todos OFF", "Todos —"]
+
+
+def montarMatrizStatus(df_dados, datas):
+    """Monta a tabela sensor × dia com o código int8 do status de cada dia.
+
+    ``df_dados`` deve estar ordenado por descricao_sensor e data_registro; o status de
+    cada Tag em cada dia é o primeiro registro encontrado. Dias sem registro (ou com
+    status desconhecido) ficam com CODIGO_SEM_REGISTRO.
+    """
+    datas = list(datas)
+    if df_dados.empty:
+        tabela = pd.DataFrame(columns=list(COLUNAS_SENSOR.values()))
+        return tabela.join(pd.DataFrame(np.zeros((0, len(datas)), dtype=np.int8), columns=datas))
+
+    # Uma linha por combinação distinta de Tag, Nome, Plataforma, Tipo e Manutenção
+    sensores = df_dados[list(COLUNAS_SENSOR)].drop_duplicates()
+    tags = pd.Index(sensores["descricao_sensor"].drop_duplicates())
+
+    registros = df_dados.drop_duplicates(["descricao_sensor", "data_registro"])
+    dias = pd.to_datetime(registros["data_registro"]).dt.strftime("%Y-%m-%d")
+
+    posicao_tag = tags.get_indexer(registros["descricao_sensor"])
+    posicao_coluna = pd.Index(datas).get_indexer(dias)
+    codigos = (
+        registros["status"].map({"ON": CODIGO_ON, "OFF": CODIGO_OFF})
+        .fillna(CODIGO_SEM_REGISTRO).to_numpy(dtype=np.int8)
+    )
+
+    # Registros fora do período pedido são descartados
+    dentro = posicao_coluna >= 0
+    status_tags = np.full((len(tags), len(datas)), CODIGO_SEM_REGISTRO, dtype=np.int8)
+    status_tags[posicao_tag[dentro], posicao_coluna[dentro]] = codigos[dentro]
+
+    # O status da Tag é repetido em todas as suas linhas
+    matriz = status_tags[tags.get_indexer(sensores["descricao_sensor"])]
+
+    tabela = sensores.rename(columns=COLUNAS_SENSOR).reset_index(drop=True)
+    return tabela.join(pd.DataFrame(matriz, columns=datas))
+
+
+def datasComRegistro(tabela, datas):
+    """Datas em que ao menos um sensor tem registro."""
+    datas = list(datas)
+    com_registro = (tabela[datas].to_numpy() != CODIGO_SEM_REGISTRO).any(axis=0)
+    return [data for data, valida in zip(datas, com_registro) if valida]
+
+
+def filtrarPorStatus(tabela, datas, modo):
+    """Mantém os sensores cujo status nas ``datas`` atende ao modo (um de FILTROS_STATUS)."""
+    matriz = tabela[list(datas)].to_numpy()
+
+    # Sem colunas de data nenhum sensor atende aos filtros
+    if matriz.shape[1] == 0:
+        return tabela.iloc[0:0]
+
+    if modo == "Todos com Variações":
+        mascara = (matriz != matriz[:, :1]).any(axis=1)
+    else:
+        codigo = {
+            "Todos ON": CODIGO_ON,
+            "Todos OFF": CODIGO_OFF,
+            "Todos —": CODIGO_SEM_REGISTRO
+        }[modo]
+        mascara = (matriz == codigo).all(axis=1)
+
+    return tabela[mascara]
+
+
+def rotularStatus(tabela, datas, rotulos_status=ROTULOS_STATUS):
+    """Cópia da tabela com os códigos de status das ``datas`` convertidos em texto para exibição."""
+    datas = list(datas)
+
+    # Sem datas a matriz vazia sai como float e não serve de índice
+    if not datas:
+        return tabela.copy()
+
+    rotulos = pd.DataFrame(rotulos_status[tabela[datas].to_numpy()], columns=datas, index=tabela.index)
+    return tabela.drop(columns=datas).join(rotulos)[list(tabela.columns)]
@@ -0,0 +1,291 @@
+import threading
+
+from utils.conexao import obterConexao
+from utils.controlar_banco_de_dados import atualizarResumoDiario, garantirParticoes
+from utils.migrar_dados import migrarDadosSqlite
+
+# Chave do advisory lock que impede dois processos de migrarem ao mesmo tempo
+CHAVE_LOCK_MIGRACOES = 7345001
+
+def particionarHistoricoSensores(cursor):
+    """Recria historico_sensores particionada por mês em data_registro, copiando os dados existentes."""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'historico_sensores'::regclass")
+    if cursor.fetchone()[0] == "p":
+        return
+
+    cursor.execute("""
+        CREATE TABLE historico_sensores_particionada (
+            id INTEGER NOT NULL DEFAULT nextval('historico_sensores_id_seq'),
+            data_registro DATE NOT NULL,
+            nome TEXT NOT NULL,
+            email TEXT NOT NULL,
+            descricao_sensor TEXT NOT NULL,
+            ultima_leitura DATE,
+            plataforma TEXT,
+            status TEXT,
+            tipo_medidor TEXT,
+            manutencao TEXT,
+            plataforma_norm TEXT GENERATED ALWAYS AS (LOWER(plataforma)) STORED,
+            tipo_medidor_norm TEXT GENERATED ALWAYS AS (LOWER(tipo_medidor)) STORED,
+            manutencao_norm TEXT GENERATED ALWAYS AS (LOWER(manutencao)) STORED,
+            CONSTRAINT historico_sensores_particionada_pkey PRIMARY KEY (id, data_registro),
+            CONSTRAINT historico_sensores_particionada_chave UNIQUE (data_registro, nome, descricao_sensor)
+        ) PARTITION BY RANGE (data_registro)
+    """)
+
+    cursor.execute("SELECT DISTINCT data_registro FROM historico_sensores")
+    garantirParticoes(cursor, [linha[0] for linha in cursor.fetchall()], "historico_sensores_particionada")
+
+    cursor.execute("""
+        INSERT INTO historico_sensores_particionada (
+            id, data_registro, nome, email, descricao_sensor, ultima_leitura,
+            plataforma, status, tipo_medidor, manutencao
+        )
+        SELECT
+            id, data_registro, nome, email, descricao_sensor, ultima_leitura,
+            plataforma, status, tipo_medidor, manutencao
+        FROM historico_sensores
+    """)
+
+    # A sequência dos ids passa para a nova tabela antes de remover a antiga
+    cursor.execute("ALTER SEQUENCE historico_sensores_id_seq OWNED BY NONE")
+    cursor.execute("DROP TABLE historico_sensores")
+    cursor.execute("ALTER TABLE historico_sensores_particionada RENAME TO historico_sensores")
+    cursor.execute("ALTER SEQUENCE historico_sensores_id_seq OWNED BY historico_sensores.id")
+
+    cursor.execute("""
+        CREATE INDEX idx_historico_sensores_data_registro
+            ON historico_sensores (data_registro, id);
+
+        CREATE INDEX idx_historico_sensores_nome_trgm
+            ON historico_sensores USING GIN (nome gin_trgm_ops);
+        CREATE INDEX idx_historico_sensores_email_trgm
+            ON historico_sensores USING GIN (email gin_trgm_ops);
+        CREATE INDEX idx_historico_sensores_descricao_trgm
+            ON historico_sensores USING GIN (descricao_sensor gin_trgm_ops);
+        CREATE INDEX idx_historico_sensores_plataforma_norm_trgm
+            ON historico_sensores USING GIN (plataforma_norm gin_trgm_ops);
+    """)
+
+
+# --- Migrações do schema, em ordem de versão ---
+# Cada passo é um SQL ou uma função que recebe o cursor.
+MIGRACOES = [
+    (1, "Tabela historico_sensores", """
+        CREATE TABLE IF NOT EXISTS historico_sensores (
+            id SERIAL PRIMARY KEY,
+            data_registro DATE NOT NULL,
+            nome TEXT NOT NULL,
+            email TEXT NOT NULL,
+            descricao_sensor TEXT NOT NULL,
+            ultima_leitura DATE,
+            plataforma TEXT,
+            status TEXT,
+            tipo_medidor TEXT,
+            manutencao TEXT,
+            UNIQUE(data_registro, nome, descricao_sensor)
+        );
+
+        ALTER TABLE historico_sensores ADD COLUMN IF NOT EXISTS manutencao TEXT;
+    """),
+
+    (2, "Tabelas usuarios e historico_acesso", """
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id SERIAL PRIMARY KEY,
+            nome TEXT NOT NULL,
+            email TEXT NOT NULL,
+            cliente_ativo BOOLEAN,
+            plataforma TEXT,
+            UNIQUE(email, plataforma)
+        );
+
+        CREATE TABLE IF NOT EXISTS historico_acesso (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+            data_registro DATE NOT NULL,
+            acessos INTEGER,
+            mes TEXT,
+            UNIQUE(user_id, mes)
+        );
+    """),
+
+    (3, "Controle de ingestões", """
+        CREATE TABLE IF NOT EXISTS ingestoes (
+            hash_conteudo TEXT PRIMARY KEY,
+            linhas INTEGER,
+            ingerido_em TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """),
+
+    (4, "Dados legados do SQLite", migrarDadosSqlite),
+
+    (5, "Resumo diário de status ON/OFF", """
+        CREATE TABLE IF NOT EXISTS resumo_diario_status (
+            data_registro DATE NOT NULL,
+            plataforma TEXT NOT NULL,
+            tipo_medidor TEXT NOT NULL,
+            on_count INTEGER NOT NULL DEFAULT 0,
+            off_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (data_registro, plataforma, tipo_medidor)
+        );
+    """),
+
+    (6, "Carga inicial do resumo diário", atualizarResumoDiario),
+
+    (7, "Colunas normalizadas e índices de historico_sensores", """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        ALTER TABLE historico_sensores
+            ADD COLUMN IF NOT EXISTS plataforma_norm TEXT GENERATED ALWAYS AS (LOWER(plataforma)) STORED,
+            ADD COLUMN IF NOT EXISTS tipo_medidor_norm TEXT GENERATED ALWAYS AS (LOWER(tipo_medidor)) STORED,
+            ADD COLUMN IF NOT EXISTS manutencao_norm TEXT GENERATED ALWAYS AS (LOWER(manutencao)) STORED;
+
+        CREATE INDEX IF NOT EXISTS idx_historico_sensores_data_registro
+            ON historico_sensores (data_registro, id);
+
+        CREATE INDEX IF NOT EXISTS idx_historico_sensores_nome_trgm
+            ON historico_sensores USING GIN (nome gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_historico_sensores_email_trgm
+            ON historico_sensores USING GIN (email gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_historico_sensores_descricao_trgm
+            ON historico_sensores USING GIN (descricao_sensor gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_historico_sensores_plataforma_norm_trgm
+            ON historico_sensores USING GIN (plataforma_norm gin_trgm_ops);
+    """),
+
+    (8, "Particionamento mensal de historico_sensores", particionarHistoricoSensores),
+
+    (9, "historico_acesso.mes como DATE", """
+        ALTER TABLE historico_acesso
+            ALTER COLUMN mes TYPE DATE USING to_date(mes, 'MM/YYYY');
+
+        CREATE INDEX IF NOT EXISTS idx_historico_acesso_mes_user
+            ON historico_acesso (mes, user_id);
+    """),
+
+    (10, "Marca de sincronização dos acessos", """
+        CREATE TABLE IF NOT EXISTS sincronizacao_acessos (
+            user_id INTEGER PRIMARY KEY REFERENCES usuarios(id) ON DELETE CASCADE,
+            ultimo_mes DATE NOT NULL,
+            atualizado_em TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """),
+
+    (11, "Execuções do agendador", """
+        CREATE TABLE IF NOT EXISTS execucoes_agendador (
+            id SERIAL PRIMARY KEY,
+            tarefa TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            solicitado_em TIMESTAMP NOT NULL DEFAULT NOW(),
+            iniciado_em TIMESTAMP,
+            finalizado_em TIMESTAMP,
+            parametros JSONB NOT NULL DEFAULT '{}',
+            mensagem TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_execucoes_agendador_tarefa
+            ON execucoes_agendador (tarefa, status, id DESC);
+    """),
+
+    (12, "Caixa de saída de e-mails", """
+        CREATE TABLE IF NOT EXISTS caixa_saida_emails (
+            id SERIAL PRIMARY KEY,
+            destinatario TEXT NOT NULL,
+            assunto TEXT NOT NULL,
+            conteudo TEXT NOT NULL,
+            hash_sensores TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            erro TEXT,
+            criado_em TIMESTAMP NOT NULL DEFAULT NOW(),
+            reservado_em TIMESTAMP,
+            enviado_em TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_caixa_saida_emails_destinatario
+            ON caixa_saida_emails (destinatario, hash_sensores, enviado_em);
+        CREATE INDEX IF NOT EXISTS idx_caixa_saida_emails_pendentes
+            ON caixa_saida_emails (id) WHERE status = 'pendente';
+    """),
+
+    (13, "Emails de acessos sem medidor", """
+        CREATE TABLE IF NOT EXISTS emails_sem_medidor (
+            email TEXT PRIMARY KEY,
+            verificado_em TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """),
+
+    (14, "Índices de resumo e limpeza da caixa de saída", """
+        CREATE INDEX IF NOT EXISTS idx_caixa_saida_emails_abertos
+            ON caixa_saida_emails (status) WHERE status IN ('pendente', 'enviando');
+        CREATE INDEX IF NOT EXISTS idx_caixa_saida_emails_criado_em
+            ON caixa_saida_emails (criado_em);
+    """),
+
+    (15, "Espera entre tentativas da caixa de saída", """
+        ALTER TABLE caixa_saida_emails
+            ADD COLUMN IF NOT EXISTS proxima_tentativa TIMESTAMP NOT NULL DEFAULT NOW();
+
+        DROP INDEX IF EXISTS idx_caixa_saida_emails_pendentes;
+        CREATE INDEX IF NOT EXISTS idx_caixa_saida_emails_proxima_tentativa
+            ON caixa_saida_emails (proxima_tentativa, id) WHERE status = 'pendente';
+    """),
+
+    (16, "Remove colunas normalizadas sem uso de historico_sensores", """
+        ALTER TABLE historico_sensores
+            DROP COLUMN IF EXISTS tipo_medidor_norm,
+            DROP COLUMN IF EXISTS manutencao_norm;
+    """),
+]
+
+_schema_atualizado = False
+_lock = threading.Lock()
+
+
+def aplicarMigracoes():
+    """Aplica as migrações pendentes e registra a versão em schema_migracoes.
+
+    Executa no banco apenas uma vez por processo; as chamadas seguintes retornam na hora.
+    """
+    global _schema_atualizado
+    if _schema_atualizado:
+        return
+
+    with _lock:
+        if _schema_atualizado:
+            return
+
+        with obterConexao() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (CHAVE_LOCK_MIGRACOES,))
+            try:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migracoes (
+                        versao INTEGER PRIMARY KEY,
+                        descricao TEXT NOT NULL,
+                        aplicada_em TIMESTAMP NOT NULL DEFAULT NOW()
+                    )
+                """)
+                cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_migracoes")
+                versao_atual = cursor.fetchone()[0]
+                conn.commit()
+
+                for versao, descricao, passo in MIGRACOES:
+                    if versao <= versao_atual:
+                        continue
+
+                    print(f"Aplicando migração {versao}: {descricao}")
+                    if callable(passo):
+                        passo(cursor)
+                    else:
+                        cursor.execute(passo)
+
+                    cursor.execute(
+                        "INSERT INTO schema_migracoes (versao, descricao) VALUES (%s, %s)",
+                        (versao, descricao)
+                    )
+                    conn.commit()
+            finally:
+                conn.rollback()
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (CHAVE_LOCK_MIGRACOES,))
+
+        _schema_atualizado = True
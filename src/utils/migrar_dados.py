@@ -1,74 +1,69 @@
 import os
 import sqlite3
-import psycopg2
+
 import pandas as pd
+from psycopg2.extras import execute_values
+
+from utils.controlar_banco_de_dados import atualizarResumoDiario, garantirParticoes
 
 # Caminhos locais
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATABASE_DIR = os.path.join(BASE_DIR, "database")
 banco_sqlite = os.path.join(DATABASE_DIR, "sensores_atrasados.db")
 
-# --- Conexão com o SQLite ---
-conn_sqlite = sqlite3.connect(banco_sqlite)
-
-# Ler os dados da tabela SQLite
-df = pd.read_sql_query("SELECT * FROM sensores_atrasados", conn_sqlite)
-
-print(f"Total de registros lidos do SQLite: {len(df)}")
-
-# --- Conexão com o PostgreSQL ---
-conn_postgres = psycopg2.connect(
-    host="localhost",      # ou "postgres" se rodar dentro do Docker Compose
-    port="5432",
-    database="atendimento_cliente",
-    user="admin",
-    password="asp36412"
-)
-cursor_pg = conn_postgres.cursor()
-
-# Criar tabela no PostgreSQL (se não existir)
-cursor_pg.execute("""
-CREATE TABLE IF NOT EXISTS historico_sensores (
-    id SERIAL PRIMARY KEY,
-    data_registro DATE NOT NULL,
-    nome TEXT NOT NULL,
-    email TEXT NOT NULL,
-    descricao_sensor TEXT NOT NULL,
-    ultima_leitura DATE,
-    plataforma TEXT,
-    status TEXT,
-    tipo_medidor TEXT,
-    UNIQUE(data_registro, nome, descricao_sensor)
-);
-""")
-conn_postgres.commit()
-
-# Inserir registros
-for _, row in df.iterrows():
+
+def migrarDadosSqlite(cursor_pg):
+    """Copia os registros do antigo banco SQLite para historico_sensores (se o arquivo existir)."""
+    if not os.path.exists(banco_sqlite):
+        print("Banco SQLite legado não encontrado; nada a migrar.")
+        return 0
+
+    # --- Conexão com o SQLite ---
+    conn_sqlite = sqlite3.connect(banco_sqlite)
     try:
-        cursor_pg.execute("""
-            INSERT INTO historico_sensores (
-                data_registro, nome, email, descricao_sensor,
-                ultima_leitura, plataforma, status, tipo_medidor
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (data_registro, nome, descricao_sensor) DO NOTHING;
-        """, (
-            row["data_registro"],
-            row["nome"],
-            row["email"],
-            row["descricao_sensor"],
-            row["ultima_leitura"],
-            row["plataforma"],
-            row["status"],
-            row["tipo_medidor"]
-        ))
-    except Exception as e:
-        print(f"Erro ao inserir linha: {e}")
-
-conn_postgres.commit()
-
-print("✅ Migração concluída com sucesso!")
-
-# Fechar conexões
-conn_sqlite.close()
-conn_postgres.close()
+        # Ler os dados da tabela SQLite
+        df = pd.read_sql_query("SELECT * FROM sensores_atrasados", conn_sqlite)
+    finally:
+        conn_sqlite.close()
+
+    print(f"Total de registros lidos do SQLite: {len(df)}")
+
+    colunas = [
+        "data_registro", "nome", "email", "descricao_sensor",
+        "ultima_leitura", "plataforma", "status", "tipo_medidor"
+    ]
+    registros = df[colunas].astype(object).where(df[colunas].notna(), None)
+    dias = sorted(pd.to_datetime(df["data_registro"].dropna().unique()).date)
+
+    # Depois da migração 8 a tabela é particionada: os meses legados precisam de partição
+    cursor_pg.execute("SELECT relkind FROM pg_class WHERE oid = 'historico_sensores'::regclass")
+    if cursor_pg.fetchone()[0] == "p" and dias:
+        garantirParticoes(cursor_pg, dias)
+
+    # Inserir registros
+    execute_values(cursor_pg, """
+        INSERT INTO historico_sensores (
+            data_registro, nome, email, descricao_sensor,
+            ultima_leitura, plataforma, status, tipo_medidor
+        ) VALUES %s
+        ON CONFLICT (data_registro, nome, descricao_sensor) DO NOTHING
+    """, registros.itertuples(index=False, name=None))
+
+    # O resumo diário só existe a partir da migração 5 (que já o preenche por completo)
+    cursor_pg.execute("SELECT to_regclass('resumo_diario_status')")
+    if cursor_pg.fetchone()[0] is not None and dias:
+        atualizarResumoDiario(cursor_pg, dias)
+
+    print("✅ Migração concluída com sucesso!")
+    return len(df)
+
+
+# Execução manual, a partir da pasta src: python -m utils.migrar_dados
+if __name__ == "__main__":
+    from utils.conexao import obterConexao
+    from utils.migracoes import aplicarMigracoes
+
+    aplicarMigracoes()
+
+    with obterConexao() as conn, conn.cursor() as cursor:
+        migrarDadosSqlite(cursor)
@@ -1,10 +1,19 @@
+import base64
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone
+from urllib.parse import urlparse
 
 import pandas as pd
 import requests
+from dateutil import tz
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from utils.snapshot import salvarSnapshot
 
 # --- Configurações ---
 DIAS_LIMITES = 0
@@ -31,157 +40,438 @@ LISTA_REQUISICOES = json.loads(os.getenv("LISTA_REQUISICOES"))
 REQUISICAO_TODOS_MEDIDORES = os.getenv("REQUISICAO_TODOS_MEDIDORES")
 TOKEN_LITEME = os.getenv("TOKEN_LITEME")
 
-
-# --- Função para buscar sensores atrasados ---
-def buscar_atrasados(url, nome_fonte, login):
+# Tempo máximo (s) de espera por cada chamada HTTP, prazo total (s) para todas as fontes
+# (login + download completo) e limite de requisições simultâneas
+TIMEOUT_FONTE = float(os.getenv("TIMEOUT_FONTE", "60"))
+PRAZO_TOTAL_FONTES = float(os.getenv("PRAZO_TOTAL_FONTES", "900"))
+MAX_FONTES_PARALELAS = int(os.getenv("MAX_FONTES_PARALELAS", "16"))
+
+# Colunas da planilha de sensores atrasados, na ordem em que são gravadas
+COLUNAS_TABELA = [
+    "DataAtual", "Nome+Descrição", "Nome", "Email", "DescriçãoSensor",
+    "DataÚltimaLeitura", "Plataforma", "TipoMedidor", "Dias off.", "Manutencao"
+]
+
+# Campos extraídos de cada item para o caminho vetorizado (ver extrairCampos)
+COLUNAS_REGISTRO = ["Nome", "Email", "DescriçãoSensor", "UltimaLeituraMs", "TipoMedidor", "Manutencao", "Plataforma"]
+
+# Tamanho dos blocos lidos da resposta no modo streaming
+TAMANHO_BLOCO_STREAMING = 64 * 1024
+
+# Tipo de medidor informado pela Lyum → nome usado nas tabelas
+TIPOS_MEDIDOR_LYUM = {
+    "WATER": "ÁGUA",
+    "ELECTRIC": "ENERGIA",
+}
+
+# Validade (s) usada quando o token de login não informa a própria expiração
+VALIDADE_TOKEN_PADRAO = int(os.getenv("VALIDADE_TOKEN_PADRAO", "3600"))
+
+# --- Sessões HTTP (keep-alive) por host e cache de tokens por login ---
+_sessoes = {}
+_tokens = {}
+_lock_sessoes = threading.Lock()
+_lock_tokens = threading.Lock()
+
+
+def obterSessao(url):
+    """Retorna a sessão keep-alive compartilhada pelo host da URL."""
+    host = urlparse(url).netloc
+    with _lock_sessoes:
+        sessao = _sessoes.get(host)
+        if sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_FONTES_PARALELAS)
+            sessao.mount("http://", adaptador)
+            sessao.mount("https://", adaptador)
+            _sessoes[host] = sessao
+    return sessao
+
+
+def _expiracaoToken(token):
+    # Tokens JWT trazem a expiração no campo "exp"; os demais usam a validade padrão
     try:
-        access_token = requests.post(login)
-        token = access_token.json()["token"]
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"]) - 30
+    except Exception:
+        return time.time() + VALIDADE_TOKEN_PADRAO
+
+
+def obterToken(login, timeout=TIMEOUT_FONTE, renovar=False):
+    """Retorna o token da plataforma, fazendo login só quando o cache expirou."""
+    if not renovar:
+        with _lock_tokens:
+            em_cache = _tokens.get(login)
+        if em_cache and em_cache[1] > time.time():
+            return em_cache[0]
+
+    resposta = obterSessao(login).post(login, timeout=timeout)
+    resposta.raise_for_status()
+    token = resposta.json()["token"]
+
+    with _lock_tokens:
+        _tokens[login] = (token, _expiracaoToken(token))
+    return token
+
+
+def requisicaoAutenticada(url, login, timeout=TIMEOUT_FONTE, **kwargs):
+    """GET autenticado com o token em cache; refaz o login apenas em caso de 401."""
+    sessao = obterSessao(url)
+    response = sessao.get(url, headers={"Access-Token": obterToken(login, timeout)}, timeout=timeout, **kwargs)
+
+    if response.status_code == 401:
+        response.close()
+        token = obterToken(login, timeout, renovar=True)
+        response = sessao.get(url, headers={"Access-Token": token}, timeout=timeout, **kwargs)
+
+    return response
+
+
+# --- Leitura em streaming do JSON das plataformas ---
+_CARACTERES_NUMERO = frozenset("0123456789.eE+-")
+
+
+def _podeContinuarNumero(valor, buffer, final):
+    # Só é seguro aceitar um número quando há depois dele um caractere que não faz parte de números
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return False
+    return all(caractere in _CARACTERES_NUMERO for caractere in buffer[final:])
+
+
+def iterarItensJson(blocos, chave="data"):
+    """Gera, um a um, os itens do array ``chave`` de um objeto JSON recebido em blocos de texto.
+
+    Apenas o item corrente fica em memória, em vez da resposta inteira.
+    """
+    decoder = json.JSONDecoder()
+    blocos = iter(blocos)
+    buffer = ""
+    pos = 0
+    fim = False
+
+    def carregar():
+        nonlocal buffer, pos, fim
+        bloco = next(blocos, None)
+        if bloco is None:
+            fim = True
+            return False
+        buffer = buffer[pos:] + bloco
+        pos = 0
+        return True
+
+    def proximoCaractere():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not carregar():
+                return ""
+
+    def decodificar():
+        nonlocal pos
+        proximoCaractere()
+        while True:
+            try:
+                valor, final = decoder.raw_decode(buffer, pos)
+                # Um número no fim do buffer pode continuar no próximo bloco (ex.: "12." + "5")
+                if fim or not _podeContinuarNumero(valor, buffer, final):
+                    pos = final
+                    return valor
+            except json.JSONDecodeError:
+                if fim:
+                    raise
+            carregar()
+
+    if proximoCaractere() != "{":
+        return
+    pos += 1
+
+    while True:
+        caractere = proximoCaractere()
+        if caractere in ("}", ""):
+            return
+        if caractere == ",":
+            pos += 1
+            continue
 
-        response = requests.get(url, headers={"Access-Token": token})
-        if response.status_code != 200:
-            return []
+        nome = decodificar()
+        if proximoCaractere() != ":":
+            raise ValueError("JSON inválido: esperado ':' após a chave")
+        pos += 1
 
-        data = response.json()
+        if nome != chave or proximoCaractere() != "[":
+            decodificar()
+            continue
+        pos += 1
+
+        while True:
+            caractere = proximoCaractere()
+            if caractere == "]":
+                return
+            if caractere == ",":
+                pos += 1
+                continue
+            if caractere == "":
+                raise ValueError("JSON incompleto")
+            yield decodificar()
+
+
+def normalizarItem(item, nome_fonte):
+    """Aplica as correções da plataforma ao item (no próprio dicionário) e define fonte e TipoMedidor.
+
+    Retorna None para fontes que não são tratadas.
+    """
+    if nome_fonte in ["LiteMe", "LiteMe - UFCG"]:
+        # Corrige nome do usuário (LiteMe e UFCG)
+        user = item.setdefault("user", {})
+        user["name"] = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip()
+        tipo = "ENERGIA"
 
-        # Garante que o formato contém 'data'
-        if "data" not in data:
-            return []
+    elif nome_fonte == "Lyum":
+        # Corrige timestamps para Lyum
+        if item.get("lastMeasurementTimestamp"):
+            item["lastMeasurementTimestamp"] = item["lastMeasurementTimestamp"] * 1000 - 3 * 60 * 60 * 1000
 
-        sensores = data["data"]
+        sensor = item.get("sensor") or {}
+        if "utility" in sensor:
+            tipo = TIPOS_MEDIDOR_LYUM.get(sensor["utility"], sensor["utility"])
+        else:
+            tipo = "NÃO ESPECÍFICADO"
 
-        # Corrige timestamps para Lyum
-        if nome_fonte == "Lyum":
-            for item in sensores:
-                if "lastMeasurementTimestamp" in item and item["lastMeasurementTimestamp"]:
-                    ts = item["lastMeasurementTimestamp"] * 1000
-                    corrigido = ts - 3 * 60 * 60 * 1000
-                    item["lastMeasurementTimestamp"] = corrigido
+    else:
+        return None
+
+    item["fonte"] = nome_fonte
+    item["TipoMedidor"] = tipo
+    return item
 
-        # Corrige nome do usuário (LiteMe e UFCG)
-        if nome_fonte in ["LiteMe", "LiteMe - UFCG"]:
-            for item in sensores:
-                user = item.get("user", {})
-                nome_completo = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip()
-                item["user"]["name"] = nome_completo
-
-        # Filtra atrasados
-        atrasados = []
-        for item in sensores:
-            if nome_fonte in ["LiteMe", "LiteMe - UFCG"]:
-                atrasados.append({**item, "fonte": nome_fonte, "TipoMedidor": "ENERGIA"})
-            elif nome_fonte == "Lyum":
-                if "utility" in item["sensor"]:
-                    tipo = item["sensor"]["utility"]
-                    if tipo == "WATER":
-                        atrasados.append({**item, "fonte": nome_fonte, "TipoMedidor": "ÁGUA"})
-                    elif tipo == "ELECTRIC":
-                        atrasados.append({**item, "fonte": nome_fonte, "TipoMedidor": "ENERGIA"})
-                    else:
-                        atrasados.append({**item, "fonte": nome_fonte, "TipoMedidor": tipo})
-                else:
-                    atrasados.append({**item, "fonte": nome_fonte, "TipoMedidor": "NÃO ESPECÍFICADO"})
-
-        return atrasados
+
+def iterarAtrasados(url, nome_fonte, login, timeout=TIMEOUT_FONTE):
+    """Gera os sensores normalizados da fonte à medida que a resposta é recebida."""
+    response = requisicaoAutenticada(url, login, timeout, stream=True)
+    with response:
+        response.raise_for_status()
+
+        response.encoding = response.encoding or "utf-8"
+        blocos = response.iter_content(chunk_size=TAMANHO_BLOCO_STREAMING, decode_unicode=True)
+
+        for item in iterarItensJson(blocos):
+            item = normalizarItem(item, nome_fonte)
+            if item is not None:
+                yield item
+
+
+# --- Função para buscar sensores atrasados ---
+def buscar_atrasados(url, nome_fonte, login, timeout=TIMEOUT_FONTE, montar=None):
+    """Lista os sensores da fonte; com ``montar``, cada item é convertido (ou descartado, se None) ao ser lido.
+
+    Falhas da fonte (login, timeout, resposta de erro) levantam RuntimeError com o nome da fonte.
+    """
+    try:
+        itens = iterarAtrasados(url, nome_fonte, login, timeout)
+        if montar is None:
+            return list(itens)
+        return [linha for linha in map(montar, itens) if linha is not None]
 
     except Exception as e:
-        return []
+        raise RuntimeError(f"Erro ao buscar sensores de {nome_fonte}: {e}") from e
 
 
-def gerarTabelas():
-    # --- Executa todas as requisições ---
-    todos = []
-    for req in LISTA_REQUISICOES:
-        todos.extend(buscar_atrasados(req["url"], req["fonte"], req["login"]))
-
-    print(f"\nTotal geral de sensores atrasados: {len(todos)}")
-
-    # --- Monta DataFrame e gera planilha ---
-    linhas = []
-    for item in todos:
-        user = item.get("user", {})
-        sensor = item.get("sensor", {})
-
-        nome = user.get("name", "")
-        email = user.get("email", "")
-        descricao = sensor.get("description", "")
-        ultima_leitura = item.get("lastMeasurementTimestamp")
-        tipo_medidor = item.get("TipoMedidor")
-        manutencao = str(sensor.get("maintenance", "indeterminado"))
-
-        if ultima_leitura:
-            data_leitura = datetime.fromtimestamp(ultima_leitura / 1000)
-            dias_off = (datetime.now().date() - data_leitura.date()).days
-            data_ultima_leitura_str = data_leitura.strftime("%d/%m/%Y")
-        else:
-            continue
+def buscarTodosAtrasados(requisicoes=None, paralelo=True, timeout=TIMEOUT_FONTE, montar=None,
+                         prazo=PRAZO_TOTAL_FONTES):
+    """Busca os sensores de todas as fontes, em paralelo por padrão.
 
-        linhas.append({
-            "DataAtual": datetime.now().strftime("%d/%m/%Y"),
-            "Nome+Descrição": f"{nome}{descricao}",
-            "Nome": nome,
-            "Email": email,
-            "DescriçãoSensor": descricao,
-            "DataÚltimaLeitura": data_ultima_leitura_str,
-            "Plataforma": item.get("fonte"),
-            "TipoMedidor": tipo_medidor,
-            "Dias off.": dias_off,
-            "Manutencao": manutencao
-        })
+    No modo paralelo o tempo total passa a ser o da fonte mais lenta. ``timeout`` vale
+    para cada chamada HTTP; se alguma fonte não terminar dentro de ``prazo`` segundos,
+    levanta TimeoutError em vez de devolver um resultado parcial. Se alguma fonte falhar,
+    as demais terminam e é levantado RuntimeError com os erros de todas as que falharam.
+    """
+    if requisicoes is None:
+        requisicoes = LISTA_REQUISICOES
+
+    todos = []
 
-    df = pd.DataFrame(linhas)
+    if not paralelo or len(requisicoes) <= 1:
+        for req in requisicoes:
+            todos.extend(buscar_atrasados(req["url"], req["fonte"], req["login"], timeout, montar))
+        return todos
 
-    # Salva a planilha de sensores atrasados na pasta tabelas
-    local_tabela = os.path.join(os.path.join(TABELAS_DIR), os.path.basename('sensores_atrasados.xlsx'))
-    df.to_excel(local_tabela, index=False, engine='openpyxl')
+    executor = ThreadPoolExecutor(
+        max_workers=min(MAX_FONTES_PARALELAS, len(requisicoes)),
+        thread_name_prefix="fonte"
+    )
+    try:
+        futuros = [
+            executor.submit(buscar_atrasados, req["url"], req["fonte"], req["login"], timeout, montar)
+            for req in requisicoes
+        ]
+        _, pendentes = wait(futuros, timeout=prazo)
+
+        if pendentes:
+            atrasadas = [req["fonte"] for req, futuro in zip(requisicoes, futuros) if futuro in pendentes]
+            raise TimeoutError(f"Tempo esgotado ao buscar sensores de: {', '.join(atrasadas)}")
+
+        erros = [futuro.exception() for futuro in futuros if futuro.exception() is not None]
+        if erros:
+            raise RuntimeError("; ".join(str(erro) for erro in erros)) from erros[0]
+
+        # Mantém a ordem de LISTA_REQUISICOES no resultado
+        for futuro in futuros:
+            todos.extend(futuro.result())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return todos
+
+
+def montarLinha(item):
+    user = item.get("user", {})
+    sensor = item.get("sensor", {})
+
+    nome = user.get("name", "")
+    email = user.get("email", "")
+    descricao = sensor.get("description", "")
+    ultima_leitura = item.get("lastMeasurementTimestamp")
+    tipo_medidor = item.get("TipoMedidor")
+    manutencao = str(sensor.get("maintenance", "indeterminado"))
+
+    if not ultima_leitura:
+        return None
+
+    data_leitura = datetime.fromtimestamp(ultima_leitura / 1000)
+    dias_off = (datetime.now().date() - data_leitura.date()).days
+    data_ultima_leitura_str = data_leitura.strftime("%d/%m/%Y")
+
+    return {
+        "DataAtual": datetime.now().strftime("%d/%m/%Y"),
+        "Nome+Descrição": f"{nome}{descricao}",
+        "Nome": nome,
+        "Email": email,
+        "DescriçãoSensor": descricao,
+        "DataÚltimaLeitura": data_ultima_leitura_str,
+        "Plataforma": item.get("fonte"),
+        "TipoMedidor": tipo_medidor,
+        "Dias off.": dias_off,
+        "Manutencao": manutencao
+    }
+
+
+def extrairCampos(item):
+    """Extrai do item apenas os campos usados na tabela (None se não houver leitura)."""
+    ultima_leitura = item.get("lastMeasurementTimestamp")
+    if not ultima_leitura:
+        return None
+
+    user = item.get("user", {})
+    sensor = item.get("sensor", {})
+
+    return (
+        user.get("name", ""),
+        user.get("email", ""),
+        sensor.get("description", ""),
+        ultima_leitura,
+        item.get("TipoMedidor"),
+        str(sensor.get("maintenance", "indeterminado")),
+        item.get("fonte")
+    )
+
+
+def montarTabela(registros, agora=None):
+    """Monta a tabela de sensores a partir dos campos de extrairCampos, com as datas calculadas em bloco.
+
+    ``agora`` é fixado uma única vez, para que todas as linhas tenham a mesma data de referência.
+    """
+    agora = agora or datetime.now()
+    df = pd.DataFrame.from_records(registros, columns=COLUNAS_REGISTRO)
+
+    # Mesmo resultado de datetime.fromtimestamp: instante em UTC convertido para o fuso local.
+    # gettz() lê o arquivo do fuso (TZ ou /etc/localtime), que o pandas converte em bloco;
+    # tzlocal() só é usado se não houver arquivo, pois calcula o deslocamento linha a linha
+    data_leitura = (
+        pd.to_datetime(df.pop("UltimaLeituraMs"), unit="ms", utc=True)
+        .dt.tz_convert(tz.gettz() or tz.tzlocal())
+        .dt.tz_localize(None)
+        .dt.normalize()
+    )
+
+    # Formata cada dia distinto uma única vez
+    codigos, dias_unicos = pd.factorize(data_leitura)
+    df["DataÚltimaLeitura"] = dias_unicos.strftime("%d/%m/%Y").to_numpy()[codigos]
+    df["Dias off."] = (pd.Timestamp(agora.date()) - data_leitura).dt.days
+    df["DataAtual"] = agora.strftime("%d/%m/%Y")
+    df["Nome+Descrição"] = df["Nome"].astype(str) + df["DescriçãoSensor"].astype(str)
+
+    return df[COLUNAS_TABELA]
+
+
+def gerarTabelas(paralelo=True, vetorizado=True):
+    # --- Executa todas as requisições, extraindo os campos enquanto os itens chegam ---
+    if vetorizado:
+        registros = buscarTodosAtrasados(paralelo=paralelo, montar=extrairCampos)
+        df = montarTabela(registros)
+    else:
+        df = pd.DataFrame(buscarTodosAtrasados(paralelo=paralelo, montar=montarLinha))
+
+    print(f"\nTotal geral de sensores atrasados: {len(df)}")
+
+    # Salva o snapshot de sensores atrasados na pasta tabelas
+    salvarSnapshot(df)
 
     return True
 
 
 def buscarUsuarios():
-    response = requests.get(REQUISICAO_TODOS_MEDIDORES, headers={"Access-Token": TOKEN_LITEME})
-    data = response.json()
-
-    if "data" not in data:
-        return []
-
-    medidores = data["data"]
+    """Lista os usuários distintos do LiteMe, lendo a lista de medidores em streaming."""
+    response = obterSessao(REQUISICAO_TODOS_MEDIDORES).get(
+        REQUISICAO_TODOS_MEDIDORES, headers={"Access-Token": TOKEN_LITEME}, timeout=TIMEOUT_FONTE, stream=True)
 
     usuarios = []
     vistos = set()
 
-    for medidor in medidores:
-        user = medidor.get("user", {})
+    with response:
+        response.encoding = response.encoding or "utf-8"
+        medidores = iterarItensJson(response.iter_content(chunk_size=TAMANHO_BLOCO_STREAMING, decode_unicode=True))
 
-        nome = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip()
-        email = user.get("email", "")
-        plataforma = "LiteMe"
-        cliente_ativo = True
+        for medidor in medidores:
+            user = medidor.get("user", {})
 
-        chave = (email, plataforma)
+            nome = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip()
+            email = user.get("email", "")
+            plataforma = "LiteMe"
+            cliente_ativo = True
 
-        if chave in vistos:
-            continue
+            chave = (email, plataforma)
 
-        vistos.add(chave)
+            if chave in vistos:
+                continue
 
-        usuarios.append({
-            "nome": nome,
-            "email": email,
-            "plataforma": plataforma,
-            "cliente_ativo": cliente_ativo
-        })
+            vistos.add(chave)
+
+            usuarios.append({
+                "nome": nome,
+                "email": email,
+                "plataforma": plataforma,
+                "cliente_ativo": cliente_ativo
+            })
 
     return usuarios
 
 
-def buscarMetricas(usuarios, inicio, fim):
+def buscarMetricasPorEmail(inicio, fim):
+    """Acessos mensais do LiteMe entre os timestamps (ms) ``inicio`` e ``fim``, agrupados por email.
+
+    Retorna None quando a resposta não traz dados.
+    """
     url_metrica = f"https://painel.liteme.com.br/service/rest/user/metrics?start={inicio}&end={fim}"
-    response_metrica = requests.get(url_metrica, headers={"Access-Token": TOKEN_LITEME})
+    response_metrica = obterSessao(url_metrica).get(
+        url_metrica, headers={"Access-Token": TOKEN_LITEME}, timeout=TIMEOUT_FONTE)
     data = response_metrica.json()
 
     if "data" not in data:
-        return []
+        return None
 
     metrica = data["data"]
 
@@ -201,6 +491,15 @@ def buscarMetricas(usuarios, inicio, fim):
 
         metrics_by_email[email] = lista
 
+    return metrics_by_email
+
+
+def buscarMetricas(usuarios, inicio, fim):
+    metrics_by_email = buscarMetricasPorEmail(inicio, fim)
+
+    if metrics_by_email is None:
+        return []
+
     return combinarUsuariosEMetricas(usuarios, metrics_by_email)
 
 
@@ -221,5 +520,6 @@ def combinarUsuariosEMetricas(usuarios, metrics):
 
 
 def timestampParaMes(timestamp_ms):
+    """Retorna o primeiro dia do mês do timestamp (valor gravado em historico_acesso.mes)."""
     data = datetime.fromtimestamp(timestamp_ms / 1000)
-    return data.date().strftime("%m/%Y")
+    return data.date().replace(day=1)
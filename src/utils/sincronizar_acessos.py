@@ -0,0 +1,101 @@
+import os
+from datetime import date, datetime, timedelta
+
+from utils.controlar_banco_de_dados import (
+    buscarEmailsSemMedidor,
+    buscarUsuariosSincronizacao,
+    salvarEmailsSemMedidor,
+    salvarMarcasSincronizacao,
+    salvarMetricas
+)
+from utils.requisicoes import buscarMetricasPorEmail, buscarUsuarios
+
+# Dias até conferir de novo, na lista de medidores, um email de acessos sem dono conhecido
+ACESSOS_REVERIFICAR_DIAS = int(os.getenv("ACESSOS_REVERIFICAR_DIAS", "30"))
+
+
+def _proximoMes(dia):
+    return (dia.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _timestampMs(dia):
+    return int(datetime.combine(dia, datetime.min.time()).timestamp() * 1000)
+
+
+def sincronizarMetricas(inicio=None, fim=None):
+    """Sincroniza os acessos do LiteMe a partir da marca de cada usuário em sincronizacao_acessos.
+
+    Sem ``inicio``, só são pedidos os meses após a menor marca (o mês corrente é sempre
+    incluído, pois ainda está em aberto) e usuários sem marca começam no mês corrente.
+    Com ``inicio``, todos os usuários são sincronizados a partir daquele mês.
+    A marca de um usuário só avança se a busca começou até o mês seguinte a ela (sem
+    lacunas) e nunca passa do último mês fechado coberto por ``fim``; usuários sem marca
+    recebem a do mês anterior quando a busca cobre o mês corrente.
+    A lista completa de medidores só é baixada se a resposta trouxer emails desconhecidos;
+    os que continuam sem dono ficam em emails_sem_medidor e não disparam nova busca
+    por ACESSOS_REVERIFICAR_DIAS dias.
+    Retorna a quantidade de usuários com acessos gravados.
+    """
+    hoje = date.today()
+    fim = min(fim or hoje, hoje)
+    mes_atual = hoje.replace(day=1)
+    mes_anterior = (mes_atual - timedelta(days=1)).replace(day=1)
+
+    usuarios = {usuario["email"]: usuario for usuario in buscarUsuariosSincronizacao()}
+
+    if inicio is not None:
+        inicio_busca = inicio.replace(day=1)
+    else:
+        inicio_busca = min(
+            [_proximoMes(usuario["ultimo_mes"]) for usuario in usuarios.values() if usuario["ultimo_mes"]]
+            + [mes_atual]
+        )
+
+    metricas_por_email = buscarMetricasPorEmail(_timestampMs(inicio_busca), _timestampMs(fim))
+    if metricas_por_email is None:
+        return 0
+
+    # Descoberta de usuários novos apenas quando necessário
+    desconhecidos = set(metricas_por_email) - set(usuarios)
+    if desconhecidos:
+        desconhecidos -= buscarEmailsSemMedidor(ACESSOS_REVERIFICAR_DIAS)
+
+    if desconhecidos:
+        for usuario in buscarUsuarios():
+            usuarios.setdefault(usuario["email"], {**usuario, "ultimo_mes": None})
+        salvarEmailsSemMedidor(desconhecidos - set(usuarios))
+
+    metricas = []
+    for email, usuario in usuarios.items():
+        if inicio is not None:
+            corte = inicio_busca
+        elif usuario["ultimo_mes"]:
+            corte = _proximoMes(usuario["ultimo_mes"])
+        else:
+            corte = mes_atual
+
+        acessos = [acesso for acesso in metricas_por_email.get(email, []) if acesso["month"] >= corte]
+        if acessos:
+            metricas.append({
+                "nome": usuario["nome"],
+                "email": email,
+                "plataforma": usuario["plataforma"],
+                "cliente_ativo": usuario["cliente_ativo"],
+                "acessos_por_mes": acessos
+            })
+
+    salvarMetricas(metricas)
+
+    # Último mês fechado inteiramente coberto pela busca
+    ultimo_mes_buscado = min(mes_anterior, ((fim + timedelta(days=1)).replace(day=1) - timedelta(days=1)).replace(day=1))
+
+    # Usuários sem marca começam no mês corrente: quando a busca chega até ele, a marca fica
+    # no mês anterior, para que a primeira execução após a virada ainda busque o mês que fechou
+    if ultimo_mes_buscado >= inicio_busca or fim >= mes_atual:
+        emails_marcados = [
+            email for email, usuario in usuarios.items()
+            if usuario["ultimo_mes"] is None or inicio_busca <= _proximoMes(usuario["ultimo_mes"])
+        ]
+        salvarMarcasSincronizacao(emails_marcados, ultimo_mes_buscado)
+
+    return len(metricas)
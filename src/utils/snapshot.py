@@ -0,0 +1,90 @@
+import hashlib
+import io
+import os
+
+import pandas as pd
+from pyarrow import feather
+
+# Caminho absoluto até a raiz do projeto
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATABASE_DIR = os.path.join(BASE_DIR, "database")
+TABELAS_DIR = os.path.join(DATABASE_DIR, "tabelas")
+
+os.makedirs(DATABASE_DIR, exist_ok=True)
+os.makedirs(TABELAS_DIR, exist_ok=True)
+
+# Snapshot dos sensores atrasados em Arrow IPC (Feather v2), sem compressão,
+# para que possa ser aberto via memory map
+CAMINHO_SNAPSHOT = os.path.join(TABELAS_DIR, "sensores_atrasados.arrow")
+
+# Último hash calculado por arquivo: caminho (ou id do arquivo enviado) -> (versão, hash)
+_hashes = {}
+
+
+def ehExcel(arquivo):
+    """Indica se o arquivo (caminho ou arquivo enviado pelo Streamlit) é uma planilha Excel."""
+    nome = str(getattr(arquivo, "name", arquivo))
+    return nome.lower().endswith((".xlsx", ".xls"))
+
+
+def _chaveHash(arquivo):
+    # Identifica o arquivo e sua versão sem ler o conteúdo; None quando não é possível (DataFrames)
+    if isinstance(arquivo, pd.DataFrame):
+        return None
+    if hasattr(arquivo, "getvalue"):
+        id_arquivo = getattr(arquivo, "file_id", None)
+        return (("envio", id_arquivo), arquivo.size) if id_arquivo is not None else None
+
+    info = os.stat(arquivo)
+    return (os.path.abspath(arquivo), (info.st_mtime_ns, info.st_size))
+
+
+def hashConteudo(arquivo):
+    """Calcula o SHA-256 do conteúdo de um arquivo (caminho ou arquivo enviado) ou de um DataFrame.
+
+    Arquivos só são relidos quando mudam (caminho, mtime ou tamanho diferentes).
+    """
+    chave = _chaveHash(arquivo)
+    if chave is not None:
+        identidade, versao = chave
+        em_cache = _hashes.get(identidade)
+        if em_cache and em_cache[0] == versao:
+            return em_cache[1]
+
+    sha = hashlib.sha256()
+
+    if isinstance(arquivo, pd.DataFrame):
+        sha.update("\x1f".join(map(str, arquivo.columns)).encode("utf-8"))
+        sha.update(pd.util.hash_pandas_object(arquivo, index=False).to_numpy().tobytes())
+    elif hasattr(arquivo, "getvalue"):
+        sha.update(arquivo.getvalue())
+    else:
+        with open(arquivo, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloco)
+
+    if chave is not None:
+        _hashes[identidade] = (versao, sha.hexdigest())
+    return sha.hexdigest()
+
+
+def salvarSnapshot(df, caminho=CAMINHO_SNAPSHOT):
+    """Grava a tabela de sensores no snapshot, substituindo o anterior de forma atômica."""
+    temporario = f"{caminho}.tmp"
+    feather.write_feather(df.reset_index(drop=True), temporario, compression="uncompressed")
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def lerSnapshot(arquivo=CAMINHO_SNAPSHOT):
+    """Lê a tabela de sensores do snapshot ou de uma planilha Excel enviada pelo usuário."""
+    if ehExcel(arquivo):
+        return pd.read_excel(arquivo)
+    return feather.read_table(arquivo, memory_map=True).to_pandas()
+
+
+def exportarExcel(df):
+    """Gera a planilha Excel da tabela para download."""
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine="openpyxl")
+    return buffer.getvalue()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Os módulos são importados como "utils.*", a partir da pasta src
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# Variáveis lidas na importação dos módulos de utils
+os.environ.setdefault("LISTA_REQUISICOES", "[]")
@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("requests")
+
+from utils import requisicoes  # noqa: E402
+
+ITEM = {"user": {"firstName": "Ana"}, "sensor": {"description": "Sensor 1"}, "lastMeasurementTimestamp": 1700000000000}
+
+
+class Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def responder(self, status, corpo):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        if self.path == "/login/recusado":
+            self.responder(403, b"{}")
+        else:
+            self.responder(200, json.dumps({"token": "token-de-teste"}).encode())
+
+    def do_GET(self):
+        if self.path == "/sensores/erro":
+            self.responder(500, b"{}")
+            return
+        if self.path == "/sensores/lenta":
+            time.sleep(1)
+        self.responder(200, json.dumps({"data": [ITEM]}).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def limparTokens():
+    requisicoes._tokens.clear()
+
+
+def fonte(base, nome, sensores="ok", login="ok"):
+    return {"url": f"{base}/sensores/{sensores}", "fonte": nome, "login": f"{base}/login/{login}"}
+
+
+@pytest.mark.parametrize("paralelo", [False, True])
+def test_fontes_ok(base, paralelo):
+    fontes = [fonte(base, "LiteMe"), fonte(base, "Lyum")]
+    assert len(requisicoes.buscarTodosAtrasados(fontes, paralelo=paralelo)) == 2
+
+
+@pytest.mark.parametrize("paralelo", [False, True])
+@pytest.mark.parametrize("falha", [{"sensores": "erro"}, {"login": "recusado"}, {"sensores": "lenta"}])
+def test_fonte_com_falha_levanta_erro(base, paralelo, falha):
+    fontes = [fonte(base, "LiteMe"), fonte(base, "Lyum", **falha)]
+    with pytest.raises(RuntimeError, match="Lyum"):
+        requisicoes.buscarTodosAtrasados(fontes, paralelo=paralelo, timeout=0.2)
@@ -0,0 +1,105 @@
+import os
+from datetime import date
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("psycopg2")
+pytest.importorskip("sqlalchemy")
+
+# Usa o banco configurado em DB_*: rode só contra um banco de teste
+pytestmark = pytest.mark.skipif(
+    os.getenv("TESTE_BANCO") != "1",
+    reason="defina TESTE_BANCO=1 e DB_* apontando para um banco PostgreSQL de teste"
+)
+
+DIA_TESTE = date(2001, 1, 15)
+
+# Filtros de data: a página ordenada por (data_registro, id) é atendida pelo índice B-tree
+CASOS_DATA = [
+    ("ano e mês", {"ano": "2001", "mes": "1"}),
+    ("data", {"data_registro": DIA_TESTE}),
+]
+
+# Filtros de texto: índices trigram (GIN), que só existem como Bitmap Index Scan
+CASOS_TEXTO = [
+    ("nome", {"nome": "silva"}, "nome"),
+    ("email", {"email": "silva@"}, "email"),
+    ("plataforma", {"plataforma": "LiteMe"}, "plataforma_norm"),
+]
+
+
+def nosDoPlano(plano):
+    yield plano
+    for filho in plano.get("Plans", []):
+        yield from nosDoPlano(filho)
+
+
+@pytest.fixture
+def cursor():
+    from utils.conexao import engine
+    from utils.controlar_banco_de_dados import garantirParticoes
+    from utils.migracoes import aplicarMigracoes
+
+    aplicarMigracoes()
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            # Tudo é desfeito no fim: partição e linhas de teste só existem nesta transação
+            garantirParticoes(cur, [DIA_TESTE])
+            cur.execute("""
+                INSERT INTO historico_sensores (data_registro, nome, email, descricao_sensor, plataforma)
+                VALUES (%s, 'Maria Silva', 'silva@exemplo.com', 'Tag 1', 'LiteMe')
+            """, (DIA_TESTE,))
+            # Sem varredura sequencial disponível, um predicado que não usa índice aparece como Seq Scan
+            cur.execute("SET LOCAL enable_seqscan = off")
+            yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def explicar(cursor, sql, params):
+    cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    return list(nosDoPlano(cursor.fetchone()[0][0]["Plan"]))
+
+
+def indicesUsados(nos):
+    return [no.get("Index Name", "") for no in nos if "Index" in no["Node Type"]]
+
+
+@pytest.mark.parametrize("descricao, filtros", CASOS_DATA, ids=[caso[0] for caso in CASOS_DATA])
+def test_filtros_de_data_usam_indice(cursor, descricao, filtros):
+    from utils.consultas_sensores import consultaPaginaSensores, montarFiltrosSensores
+
+    nos = explicar(cursor, *consultaPaginaSensores(*montarFiltrosSensores(**filtros)))
+
+    assert not [no for no in nos if no["Node Type"] == "Seq Scan"], descricao
+    assert any("data_registro" in indice for indice in indicesUsados(nos)), indicesUsados(nos)
+
+
+@pytest.mark.parametrize("descricao, filtros, coluna", CASOS_TEXTO, ids=[caso[0] for caso in CASOS_TEXTO])
+def test_filtros_de_texto_usam_indice_trigram(cursor, descricao, filtros, coluna):
+    from utils.consultas_sensores import montarFiltrosSensores
+
+    where, params = montarFiltrosSensores(**filtros)
+
+    # Com LIMIT e ORDER BY o planejador pode preferir, legitimamente, percorrer o índice de
+    # data filtrando as linhas; aqui só o predicado é avaliado, e apenas varreduras bitmap
+    # ficam disponíveis, então o plano mostra se o filtro é atendido por um índice
+    cursor.execute("SET LOCAL enable_indexscan = off")
+    cursor.execute("SET LOCAL enable_indexonlyscan = off")
+    nos = explicar(cursor, f"SELECT id FROM historico_sensores WHERE {where}", params)
+
+    assert not [no for no in nos if no["Node Type"] == "Seq Scan"], descricao
+    assert any(coluna in indice for indice in indicesUsados(nos)), indicesUsados(nos)
+
+
+def test_paginacao_por_chave_usa_indice_de_data(cursor):
+    from utils.consultas_sensores import consultaPaginaSensores
+
+    nos = explicar(cursor, *consultaPaginaSensores("TRUE", {}, apos=(DIA_TESTE, 1)))
+
+    assert not [no for no in nos if no["Node Type"] == "Seq Scan"]
+    assert any("data_registro" in indice for indice in indicesUsados(nos))
@@ -0,0 +1,57 @@
+import socket
+import threading
+
+import pytest
+
+requests = pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+
+from utils import enviar_emails  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def configuracao(monkeypatch):
+    monkeypatch.setattr(enviar_emails, "ACCESS_TOKEN", "token-de-teste")
+    monkeypatch.setattr(enviar_emails, "_expiracao_token", None)
+    monkeypatch.setattr(enviar_emails, "EMAIL_ESPERA_BASE", 0)
+    monkeypatch.setattr(enviar_emails, "EMAIL_TENTATIVAS", 3)
+    monkeypatch.setattr(enviar_emails, "EMAIL_TIMEOUT", 2)
+
+
+def test_repete_quando_a_conexao_nao_foi_estabelecida(monkeypatch):
+    soquete = socket.socket()
+    soquete.bind(("127.0.0.1", 0))
+    porta_fechada = soquete.getsockname()[1]
+    soquete.close()
+    monkeypatch.setattr(enviar_emails, "ZOHO_MAIL_URL", f"http://127.0.0.1:{porta_fechada}")
+
+    with pytest.raises(RuntimeError, match="após 3 tentativas"):
+        enviar_emails.send_email("cliente@exemplo.com", "Assunto", "Conteúdo")
+
+
+def test_nao_repete_quando_o_pedido_pode_ter_sido_aceito(monkeypatch):
+    # Servidor que lê o pedido inteiro e fecha a conexão sem responder
+    servidor = socket.socket()
+    servidor.bind(("127.0.0.1", 0))
+    servidor.listen()
+    pedidos = []
+
+    def atender():
+        while True:
+            try:
+                conexao, _ = servidor.accept()
+            except OSError:
+                return
+            pedidos.append(conexao.recv(65536))
+            conexao.close()
+
+    threading.Thread(target=atender, daemon=True).start()
+    monkeypatch.setattr(enviar_emails, "ZOHO_MAIL_URL", f"http://127.0.0.1:{servidor.getsockname()[1]}")
+
+    try:
+        with pytest.raises(requests.ConnectionError):
+            enviar_emails.send_email("cliente@exemplo.com", "Assunto", "Conteúdo")
+    finally:
+        servidor.close()
+
+    assert len(pedidos) == 1
@@ -0,0 +1,47 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from utils.historico import (  # noqa: E402
+    COLUNAS_SENSOR,
+    FILTROS_STATUS,
+    datasComRegistro,
+    filtrarPorStatus,
+    montarMatrizStatus,
+    rotularStatus
+)
+
+COLUNAS_DADOS = list(COLUNAS_SENSOR) + ["data_registro", "status"]
+
+
+def test_periodo_sem_registros():
+    tabela = montarMatrizStatus(pd.DataFrame(columns=COLUNAS_DADOS), [])
+    datas = datasComRegistro(tabela, [])
+
+    rotulada = rotularStatus(tabela, datas)
+    assert list(rotulada.columns) == list(COLUNAS_SENSOR.values())
+    assert rotulada.empty
+
+    for modo in FILTROS_STATUS:
+        assert filtrarPorStatus(tabela, datas, modo).empty
+
+
+def test_rotular_sem_datas_mantem_a_tabela():
+    tabela = montarMatrizStatus(pd.DataFrame([
+        ("Tag 1", "Cliente", "LiteMe", "ENERGIA", "false", "2025-01-01", "ON"),
+    ], columns=COLUNAS_DADOS), ["2025-01-01"])
+
+    rotulada = rotularStatus(tabela, [])
+    pd.testing.assert_frame_equal(rotulada, tabela)
+    assert rotulada is not tabela
+
+
+def test_rotular_status():
+    dados = pd.DataFrame([
+        ("Tag 1", "Cliente", "LiteMe", "ENERGIA", "false", "2025-01-01", "ON"),
+        ("Tag 1", "Cliente", "LiteMe", "ENERGIA", "false", "2025-01-02", "OFF"),
+    ], columns=COLUNAS_DADOS)
+    datas = ["2025-01-01", "2025-01-02", "2025-01-03"]
+
+    rotulada = rotularStatus(montarMatrizStatus(dados, datas), datas)
+    assert rotulada.loc[0, datas].tolist() == ["ON", "OFF", "—"]
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("requests")
+
+from utils.requisicoes import iterarItensJson  # noqa: E402
+
+DOCUMENTO = {
+    "total": 12.5,
+    "negativo": -3e-2,
+    "ativo": True,
+    "vazio": None,
+    "data": [
+        {"id": 1.25, "valores": [1, 2.5e10, -7], "texto": 'aspas " e ]}, dentro'},
+        42,
+        0.5,
+        "texto",
+        {"aninhado": {}},
+        7
+    ],
+    "depois": 99
+}
+
+
+def dividirEmBlocos(texto, tamanho):
+    return [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+
+
+@pytest.mark.parametrize("separadores", [None, (",", ":")])
+def test_itens_iguais_para_qualquer_tamanho_de_bloco(separadores):
+    texto = json.dumps(DOCUMENTO, separators=separadores)
+
+    for tamanho in range(1, len(texto) + 1):
+        assert list(iterarItensJson(dividirEmBlocos(texto, tamanho))) == DOCUMENTO["data"], tamanho
+
+
+def test_numero_cortado_no_ponto_ou_expoente():
+    assert list(iterarItensJson(['{"total": 12.', '5, "data": [1e', '3, 2]}'])) == [1000.0, 2]
+
+
+def test_sem_chave_data():
+    assert list(iterarItensJson(['{"erro": "x"}'])) == []
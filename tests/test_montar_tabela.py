@@ -0,0 +1,60 @@
+import time
+from datetime import datetime
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("requests")
+
+from utils.requisicoes import COLUNAS_TABELA, extrairCampos, montarLinha, montarTabela  # noqa: E402
+
+# Leituras perto da meia-noite local e das trocas de horário de verão de São Paulo (2018/2019)
+TIMESTAMPS_MS = [
+    1541300399000, 1541300400000, 1541311200000,
+    1550372399000, 1550372400000, 1550376000000,
+    1700000000000, 1700017200000, 1700020799000, 1700020800000,
+]
+
+
+@pytest.fixture(params=["UTC", "America/Sao_Paulo"])
+def fuso(request, monkeypatch):
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+
+def itensSinteticos():
+    itens = [
+        {
+            "user": {"name": f"Cliente {i}", "email": f"cliente{i}@exemplo.com"},
+            "sensor": {"description": f"Sensor {i}", "maintenance": i % 2 == 0},
+            "lastMeasurementTimestamp": timestamp,
+            "TipoMedidor": "ENERGIA",
+            "fonte": "LiteMe"
+        }
+        for i, timestamp in enumerate(TIMESTAMPS_MS)
+    ]
+    # Itens sem leitura ficam de fora nos dois caminhos
+    itens.append({"user": {"name": "Sem leitura"}, "sensor": {}, "lastMeasurementTimestamp": None})
+    return itens
+
+
+def test_montar_tabela_igual_a_montar_linha(fuso):
+    itens = itensSinteticos()
+    agora = datetime.now()
+
+    por_linha = pd.DataFrame([linha for linha in map(montarLinha, itens) if linha is not None])
+    vetorizada = montarTabela([campos for campos in map(extrairCampos, itens) if campos is not None], agora)
+
+    # montarLinha usa datetime.now() em cada linha; o teste não pode cruzar a meia-noite
+    if datetime.now().date() != agora.date():
+        pytest.skip("virada do dia durante o teste")
+
+    pd.testing.assert_frame_equal(por_linha[COLUNAS_TABELA], vetorizada, check_dtype=False)
+
+
+def test_montar_tabela_vazia():
+    assert list(montarTabela([]).columns) == COLUNAS_TABELA
+    assert montarTabela([]).empty